@@ -0,0 +1,76 @@
+import datetime
+from typing import NamedTuple, Optional, Union
+
+from app.activity.model.source import (
+    Activity as SourceActivity,
+    ActivityEvidence as SourceActivityEvidence,
+    ActivityFeedback as SourceActivityFeedback,
+    ActivityMember as SourceActivityMember,
+)
+
+# 원본 테이블에서 변환에 쓰는 컬럼만 읽어 담는 가벼운 row 타입
+# 필드 이름은 ORM 모델 속성과 같아서 변환 함수는 ORM 인스턴스와 record를 구분 없이 받는다.
+
+class ActivityRecord(NamedTuple):
+    id: int
+    club_id: int
+    title: str
+    activity_type_id: int
+    start_date: datetime.date
+    end_date: datetime.date
+    location: str
+    purpose: str
+    content: str
+    proof_text: Optional[str]
+    feedback_type: Optional[int]
+    recent_edit: Optional[datetime.datetime]
+    recent_feedback: Optional[datetime.datetime]
+
+    columns = (
+        SourceActivity.id,
+        SourceActivity.club_id,
+        SourceActivity.title,
+        SourceActivity.activity_type_id,
+        SourceActivity.start_date,
+        SourceActivity.end_date,
+        SourceActivity.location,
+        SourceActivity.purpose,
+        SourceActivity.content,
+        SourceActivity.proof_text,
+        SourceActivity.feedback_type,
+        SourceActivity.recent_edit,
+        SourceActivity.recent_feedback,
+    )
+
+class ActivityMemberRecord(NamedTuple):
+    activity_id: int
+    member_student_id: int
+
+    columns = (SourceActivityMember.activity_id, SourceActivityMember.member_student_id)
+
+class ActivityFeedbackRecord(NamedTuple):
+    id: int
+    activity: int
+    student_id: int
+    added_time: datetime.datetime
+    feedback: Optional[str]
+
+    columns = (
+        SourceActivityFeedback.id,
+        SourceActivityFeedback.activity,
+        SourceActivityFeedback.student_id,
+        SourceActivityFeedback.added_time,
+        SourceActivityFeedback.feedback,
+    )
+
+class ActivityEvidenceRecord(NamedTuple):
+    activity_id: int
+    image_url: str
+    description: str
+
+    columns = (SourceActivityEvidence.activity_id, SourceActivityEvidence.image_url, SourceActivityEvidence.description)
+
+ActivityRow = Union[SourceActivity, ActivityRecord]
+ActivityMemberRow = Union[SourceActivityMember, ActivityMemberRecord]
+ActivityFeedbackRow = Union[SourceActivityFeedback, ActivityFeedbackRecord]
+ActivityEvidenceRow = Union[SourceActivityEvidence, ActivityEvidenceRecord]
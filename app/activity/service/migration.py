@@ -1,3 +1,6 @@
+import asyncio
+from collections import defaultdict
+from sqlalchemy import func
 from app.activity.model.source import Activity as SourceActivity
 from app.activity.model.source import ActivitySign as SourceActivitySign
 from app.activity.model.source import ActivityEvidence as SourceActivityEvidence
@@ -8,80 +11,238 @@ from app.activity.model.target import ActivityT as TargetActivityT
 from app.activity.model.target import ActivityEvidenceFile as TargetActivityEvidenceFile
 from app.activity.model.target import ActivityFeedback as TargetActivityFeedback
 from app.activity.model.target import ActivityParticipant as TargetActivityParticipant
-from app.activity.model.target import Student as TargetStudent
-from app.activity.model.target import Executive as TargetExecutive
-from config import SourceSession, TargetSession
-from app.activity.service.transformation import transform_activity, transform_activity_t, transform_activity_participants, transform_activity_feedbacks, transform_activity_evidence_files
-
-async def migrate_activities():
-    source_session = SourceSession()
-    target_session = TargetSession()
-
-    # 원본 데이터 로드
-    for i in range(1, 88):
-        print(f"Migrating club {i}...")
-        source_activities = source_session.query(SourceActivity).order_by(SourceActivity.id).filter(SourceActivity.club_id == i).all()
-        
-        if len(source_activities) == 0:
-            continue
-    
+from app.activity.model.record import ActivityRecord, ActivityMemberRecord, ActivityFeedbackRecord, ActivityEvidenceRecord
+from app.common.service.database import open_source_session, open_target_session, run_db, close_session, ChunkedCommitter
+from app.common.service.dead_letter import DeadLetterStore
+from app.common.service.metrics import metrics
+from app.common.service.profiler import query_profiler
+from app.common.service.pipeline import run_pipeline, tolerant
+from app.common.service.run import migration_run
+from app.common.service.reader import load_rows, iter_pages
+from app.common.service.transformer import TransformPool
+from app.common.service.worker import run_clubs
+from app.common.service.writer import insert_or_update_ids, write_children, assign_parent_ids, in_savepoint
+from app.common.util import chunked, group_by, subset
+from config import PREFETCH_CHUNK_SIZE, INSERT_BATCH_SIZE, CLUB_CONCURRENCY, INCREMENTAL_SYNC
+from app.activity.service.transformation import transform_activity_rows, transform_activity_evidence_files
+
+@query_profiler.scoped("activity")
+async def migrate_activities(identity_index=None, refresh_identity_index=False, concurrency=CLUB_CONCURRENCY, checkpoint=None, file_cache=None, incremental=INCREMENTAL_SYNC, dead_letters=None):
+    """
+    activity 마이그레이션
+    incremental이면 워터마크 이후 바뀐 row만 옮기고, 이미 옮긴 row는 id 매핑으로 찾은 타겟 row를 갱신한다.
+    """
+    async with migration_run({"activity": SourceActivity}, identity_index, refresh_identity_index, checkpoint, file_cache, incremental, dead_letters) as run:
+        # 클럽별 semester_id -> 최신 sign_time 맵은 전체 테이블에서 한 번만 계산
+        source_session = open_source_session()
+        activity_sign_map = await run_db(source_session, load_activity_sign_map)
+        await close_session(source_session)
+
+        plan = run.plans["activity"]
+
+        async def migrate_club(club_id):
+            return await migrate_club_activities(club_id, run.identity_index, activity_sign_map.get(club_id, {}), run.evidence_transfer, run.checkpoint, run.transform_pool, plan.club_deltas[club_id], run.dead_letters)
+
+        # 원본 데이터 로드 및 클럽 단위 동시 마이그레이션
+        await run_clubs(sorted(plan.club_deltas), migrate_club, concurrency)
+
+@query_profiler.scoped("activity")
+async def migrate_club_activities(club_id, identity_index, activity_sign, evidence_transfer, checkpoint, transform_pool=None, delta=None, dead_letters=None):
+    """
+    club 하나의 activity를 마이그레이션하고 출력할 로그를 반환
+    club마다 별도의 source/target 세션을 쓰고, DB 작업은 run_db로 실행해 다른 club과 겹쳐 진행한다.
+    club 안에서는 읽기 -> 변환 -> 증빙 전송 -> 쓰기를 묶음 단위 파이프라인으로 겹쳐 진행한다.
+    COMMIT_BATCH_ROWS개 또는 COMMIT_INTERVAL초마다 커밋하고 커밋된 row는 checkpoint에 기록하며, 오류 없이 끝난 club만 완료로 표시한다.
+    묶음이 실패하면 activity를 하나씩 다시 처리해 실패한 activity만 savepoint로 되돌리고 dead_letters에 남긴다.
+    delta(증분 동기화 조건)가 있으면 조건에 맞는 row만 읽고, 이미 옮긴 row는 건너뛰지 않고 타겟 row를 갱신한다.
+    """
+    logs = [f"Migrating club {club_id}..."]
+    source_session = open_source_session()
+    target_session = open_target_session()
+    if transform_pool is None:
+        transform_pool = TransformPool(identity_index, processes=0)
+    if dead_letters is None:
+        dead_letters = DeadLetterStore()
+
+    try:
+        # 이전 실행에서 이미 커밋된 activity (전체 모드는 제외, 증분 모드는 갱신)
+        migrated_activity_ids = checkpoint.migrated_rows("activity", club_id)
+        criteria = [SourceActivity.club_id == club_id] if delta is None else [SourceActivity.club_id == club_id, delta]
+        existing_ids = {} if delta is None else migrated_activity_ids
+
+        def on_commit(pairs):
+            checkpoint.record_rows("activity", club_id, pairs)
+            dead_letters.resolve("activity", [source_id for source_id, _ in pairs])
+
+        committer = ChunkedCommitter(target_session, on_commit)
+        failed = False
+        failed_rows = 0
+
+        async def read_batches():
+            # 원본 activity를 id 순서로 한 페이지씩 읽고, 페이지 단위로 하위 데이터를 일괄 로드
+            async for source_activities in iter_pages(source_session, SourceActivity, ActivityRecord, SourceActivity.id, *criteria):
+                if delta is None:
+                    source_activities = [source_activity for source_activity in source_activities if source_activity.id not in migrated_activity_ids]
+                if len(source_activities) == 0:
+                    continue
+
+                prefetched = await run_db(source_session, prefetch_activity_children, club_id, source_activities, activity_sign)
+                for source_activity_batch in chunked(source_activities, INSERT_BATCH_SIZE):
+                    yield {"source_activities": source_activity_batch, "prefetched": prefetched}
+
+        async def transform(batch):
+            batch["transformed"] = await transform_activities(batch["source_activities"], batch["prefetched"], transform_pool)
+            return batch
+
+        async def transfer(batch):
+            batch["evidence_files"] = await transfer_activity_evidences(batch["source_activities"], batch["prefetched"], evidence_transfer)
+            return batch
+
+        async def write(batch):
+            nonlocal failed_rows
+            if batch.get("error") is None:
+                try:
+                    pairs = await committer.write(in_savepoint, write_activity_batch, batch["source_activities"], batch["transformed"], batch["evidence_files"], existing_ids)
+                except Exception as e:
+                    # 커밋 실패는 묶음이 아니라 club 전체의 실패
+                    if committer.error is not None:
+                        raise
+                    batch["error"] = e
+            if batch.get("error") is not None:
+                pairs = await migrate_activities_one_by_one(committer, club_id, batch, existing_ids, evidence_transfer, transform_pool, dead_letters)
+                failed_rows += len(batch["source_activities"]) - len(pairs)
+            metrics.add_rows("activity", len(pairs))
+
         try:
-            for source_activity in source_activities:
-                # 변환 로직 실행
-                await migrate_activity(target_session, source_session, source_activity)
+            await run_pipeline(read_batches(), [tolerant(transform), tolerant(transfer), write])
         except Exception as e:
-            print(f"Error during migration: {e}, clubId: {i}")
-        
-        # 커밋
-        target_session.commit()
-        print(f"Migration completed successfully. clubId: {i}")
-
-    source_session.close()
-    target_session.close()
-
-async def migrate_activity(target_session, source_session, source_activity):
-    # activity_t 변환
-    source_activity_sign = source_session.query(SourceActivitySign).filter(SourceActivitySign.club_id == source_activity.club_id).order_by(SourceActivitySign.sign_time.desc()).all()
-    transformed_activity = transform_activity(source_activity, source_activity_sign)
-    target_activity = TargetActivity(**transformed_activity)
-    target_session.add(target_activity)
-    target_session.flush()
-    target_session.refresh(target_activity)
-    target_activity_id = target_activity.id
-
-    # activity_t 변환
-    transformed_activity_t = transform_activity_t(source_activity, target_activity_id)
-    target_activity_t = TargetActivityT(**transformed_activity_t)
-    target_session.add(target_activity_t)
-
-    # activity_participant 변환
-    source_activity_participants = source_session.query(SourceActivityMember).filter(SourceActivityMember.activity_id == source_activity.id).all()
-    if source_activity_participants:
-        source_activity_member_ids = [source_activity_participant.member_student_id for source_activity_participant in source_activity_participants]
-        target_students = target_session.query(TargetStudent).filter(TargetStudent.number.in_(source_activity_member_ids)).all()
-        transformed_activity_participants = transform_activity_participants(source_activity, target_students, target_activity_id)
-        for transformed_activity_participant in transformed_activity_participants:
-            target_activity_participant = TargetActivityParticipant(**transformed_activity_participant)
-            target_session.add(target_activity_participant)
-
-    # activity_feedback 변환
-    source_activity_feedbacks = source_session.query(SourceActivityFeedback).filter(SourceActivityFeedback.activity == source_activity.id).all()
-    source_activity_feedback_student_ids = [source_activity_feedback.student_id for source_activity_feedback in source_activity_feedbacks]
-    target_executives = target_session.query(TargetExecutive).join(TargetExecutive.student) \
-        .filter(TargetStudent.number.in_(source_activity_feedback_student_ids)).all()
-    if source_activity_feedbacks:
-        transformed_activity_feedbacks = transform_activity_feedbacks(source_activity_feedbacks, target_executives, target_activity_id)
-        for transformed_activity_feedback in transformed_activity_feedbacks:
-            target_activity_feedback = TargetActivityFeedback(**transformed_activity_feedback)
-            target_session.add(target_activity_feedback)
-
-    # activity_evidence_file 변환
-    source_activity_evidences = source_session.query(SourceActivityEvidence).filter(SourceActivityEvidence.activity_id == source_activity.id).all()
-    if source_activity_evidences:
-        transformed_activity_evidence_files = await transform_activity_evidence_files(source_activity, source_activity_evidences, target_activity_id)
-        for transformed_activity_evidence_file in transformed_activity_evidence_files:
-            target_activity_evidence_file = TargetActivityEvidenceFile(**transformed_activity_evidence_file)
-            target_session.add(target_activity_evidence_file)
+            failed = True
+            logs.append(f"Error during migration: {e}, clubId: {club_id}")
+
+        # 남은 row 커밋 후 진행 기록 (커밋이 이미 실패했으면 남은 row는 버려졌다)
+        if committer.error is None:
+            await committer.flush()
+        if failed_rows:
+            failed = True
+            logs.append(f"{failed_rows} activities written to dead letter store {dead_letters.path}, clubId: {club_id}")
+        if not failed:
+            checkpoint.mark_club_completed("activity", club_id)
+            if committer.committed:
+                logs.append(f"Migration completed successfully. clubId: {club_id}")
+        elif committer.committed:
+            # 커밋된 row는 체크포인트에 남아 다음 실행에서 나머지만 다시 옮긴다
+            logs.append(f"Migration partially completed: {committer.committed} activities committed. clubId: {club_id}")
+        return logs
+    finally:
+        await close_session(source_session)
+        await close_session(target_session)
+
+def load_activity_sign_map(source_session, club_id=None):
+    """ActivitySign을 club_id -> {semester_id: 가장 최신 sign_time} 형태로 집계한다."""
+    query = source_session.query(SourceActivitySign.club_id, SourceActivitySign.semester_id, func.max(SourceActivitySign.sign_time))
+    if club_id is not None:
+        query = query.filter(SourceActivitySign.club_id == club_id)
+    rows = query.group_by(SourceActivitySign.club_id, SourceActivitySign.semester_id).all()
+
+    activity_sign_map = defaultdict(dict)
+    for sign_club_id, semester_id, sign_time in rows:
+        activity_sign_map[sign_club_id][semester_id] = sign_time
+    return activity_sign_map
+
+def prefetch_activity_children(source_session, club_id, source_activities, activity_sign=None):
+    """
+    activity들(클럽의 한 페이지)에 딸린 하위 데이터를 테이블당 한 번의 IN 쿼리로 불러와 activity id별로 묶는다.
+    activity마다 ActivitySign/ActivityMember/ActivityFeedback/ActivityEvidence를
+    따로 조회하던 것을 클럽당 고정된 쿼리 수로 줄인다.
+    """
+    activity_ids = [source_activity.id for source_activity in source_activities]
+
+    if activity_sign is None:
+        activity_sign = load_activity_sign_map(source_session, club_id).get(club_id, {})
+
+    members, feedbacks, evidences = [], [], []
+    for ids in chunked(activity_ids, PREFETCH_CHUNK_SIZE):
+        members.extend(load_rows(source_session, SourceActivityMember, ActivityMemberRecord, SourceActivityMember.activity_id.in_(ids)))
+        feedbacks.extend(load_rows(source_session, SourceActivityFeedback, ActivityFeedbackRecord, SourceActivityFeedback.activity.in_(ids), order_by=SourceActivityFeedback.id))
+        evidences.extend(load_rows(source_session, SourceActivityEvidence, ActivityEvidenceRecord, SourceActivityEvidence.activity_id.in_(ids)))
+
+    return {
+        "activity_sign": activity_sign,
+        "members": group_by(members, "activity_id"),
+        "feedbacks": group_by(feedbacks, "activity"),
+        "evidences": group_by(evidences, "activity_id"),
+    }
+
+async def migrate_activities_one_by_one(committer, club_id, batch, existing_ids, evidence_transfer, transform_pool, dead_letters):
+    """
+    묶음 처리에 실패한 activity를 하나씩 다시 변환/전송하고 각각 savepoint 안에서 쓴다.
+    그래도 실패한 activity는 savepoint까지만 되돌리고 dead_letters에 남긴다. 증빙 전송에 실패했으면 올리지 못한 URL도 함께 남긴다.
+    성공한 (원본 id, 타겟 id) 목록을 반환한다.
+    """
+    pairs = []
+    for source_activity in batch["source_activities"]:
+        stage = "transform"
+        try:
+            transformed = await transform_activities([source_activity], batch["prefetched"], transform_pool)
+            stage = "transfer"
+            evidence_files = await transfer_activity_evidences([source_activity], batch["prefetched"], evidence_transfer)
+            stage = "write"
+            pairs += await committer.write(in_savepoint, write_activity_batch, [source_activity], transformed, evidence_files, existing_ids)
+        except Exception as e:
+            if committer.error is not None:
+                raise
+            # 올리지 못한 URL = 파일 캐시에 fileId가 없는 URL
+            evidence_urls = [] if stage != "transfer" else [
+                evidence.image_url for evidence in batch["prefetched"]["evidences"].get(source_activity.id, [])
+                if evidence_transfer.cache.get_by_url(evidence.image_url) is None
+            ]
+            dead_letters.record("activity", club_id, source_activity.id, stage, e, evidence_urls)
+    return pairs
+
+async def transform_activities(source_activities, prefetched, transform_pool):
+    # 변환에는 이 묶음의 하위 row만 넘긴다
+    activity_ids = [source_activity.id for source_activity in source_activities]
+    with metrics.timed("transform", items=len(source_activities)):
+        return await transform_pool.run(
+            transform_activity_rows,
+            source_activities,
+            prefetched["activity_sign"],
+            subset(prefetched["members"], activity_ids),
+            subset(prefetched["feedbacks"], activity_ids)
+        )
+
+async def transfer_activity_evidences(source_activities, prefetched, evidence_transfer):
+    # activity_evidence_file 변환 (activity들의 전송을 동시에 진행하고, 하나라도 실패하면 이 묶음은 activity 하나씩 다시 처리한다)
+    return await asyncio.gather(*(
+        transform_activity_evidence_files(source_activity, prefetched["evidences"].get(source_activity.id, []), evidence_transfer)
+        for source_activity in source_activities
+    ))
+
+def write_activity_batch(target_session, source_activities, transformed, evidence_files_per_activity, existing_ids=None):
+    """
+    변환된 activity 묶음을 쓴다. existing_ids(원본 id -> 타겟 id)에 있는 activity는 그 id로 타겟 row를 upsert하고
+    하위 row도 기존 id를 다시 써서 upsert하므로 같은 묶음을 다시 써도 row가 늘지 않는다.
+    """
+    existing_ids = existing_ids or {}
+    source_activity_ids = [source_activity.id for source_activity in source_activities]
+    target_activity_ids = insert_or_update_ids(target_session, TargetActivity, source_activity_ids, transformed["activities"], existing_ids)
+
+    updated_activity_ids = [existing_ids[source_activity_id] for source_activity_id in source_activity_ids if source_activity_id in existing_ids]
+
+    # 변환 시 묶음 내 위치로 넣어 둔 activity_id를 실제 id로 바꾼다
+    transformed_activity_ts = assign_parent_ids(transformed["activity_ts"], "activity_id", target_activity_ids)
+    transformed_activity_participants = assign_parent_ids(transformed["participants"], "activity_id", target_activity_ids)
+    transformed_activity_feedbacks = assign_parent_ids(transformed["feedbacks"], "activity_id", target_activity_ids)
 
+    transformed_activity_evidence_files = [
+        {**evidence_file, "activity_id": target_activity_id}
+        for target_activity_id, evidence_files in zip(target_activity_ids, evidence_files_per_activity)
+        for evidence_file in evidence_files
+    ]
 
+    write_children(target_session, TargetActivityT, "activity_id", transformed_activity_ts, updated_activity_ids)
+    write_children(target_session, TargetActivityParticipant, "activity_id", transformed_activity_participants, updated_activity_ids)
+    write_children(target_session, TargetActivityFeedback, "activity_id", transformed_activity_feedbacks, updated_activity_ids)
+    write_children(target_session, TargetActivityEvidenceFile, "activity_id", transformed_activity_evidence_files, updated_activity_ids)
 
+    return [(source_activity.id, target_activity_id) for source_activity, target_activity_id in zip(source_activities, target_activity_ids)]
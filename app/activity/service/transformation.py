@@ -1,110 +1,174 @@
 import datetime
-import os
-import shutil
-import aiohttp
-import aiofiles
-import asyncio
 from typing import List, Dict
 
-from app.activity.model.source import Activity as SourceActivity, ActivityFeedback as SourceActivityFeedback, ActivitySign as SourceActivitySign
-from app.activity.model.target import Student as TargetStudent, Executive as TargetExecutive
-from config import API_ACCESS_TOKEN, API_BASE_URL
+from app.activity.model.record import ActivityRow, ActivityFeedbackRow, ActivityMemberRow, ActivityEvidenceRow
+from app.common.service.evidence import EvidenceTransfer
+from app.common.service.identity import IdentityIndex
+
+# recent_edit이 이 시각 이전이면 activity_d_id를 7로 설정
+ACTIVITY_D_CUTOFF = datetime.datetime(2024, 3, 1)
+
+# 원본 activity_type_id -> activity_type_enum_id (그 외는 2)
+activity_type_mapping = {
+    1: 3,
+    2: 1,
+}
 
 def transform_activity(
-        source_activity: SourceActivity,
-        source_activity_sign: List[SourceActivitySign]
+        source_activity: ActivityRow,
+        activity_sign: Dict[int, datetime.datetime]
     ) -> Dict:
-    # recent_edit이 2024-03-01 이전이면 activity_d_id를 7로 설정
-    if (source_activity.recent_edit < datetime.datetime(2024, 3, 1)):
-        activity_d_id = 7
-    else:
-        activity_d_id = 2
-
-    if (source_activity.activity_type_id == 1):
-        activity_type_enum_id = 3
-    elif (source_activity.activity_type_id == 2):
-        activity_type_enum_id = 1
-    else:
-        activity_type_enum_id = 2
-
-    # 리스트에서 semesterId가 activity_d_id = 7 일경우 14, 아닐경우 15인 데이터 중 sign_time이 가장 최신인 데이터를 찾아서 반환
-    if (activity_d_id == 7):
-        professor_approved_at = [sign for sign in source_activity_sign if sign.semester_id == 14]
-        if (professor_approved_at):
-            professor_approved_at = professor_approved_at[0].sign_time
-        else:
-            professor_approved_at = None
-    else:
-        professor_approved_at = [sign for sign in source_activity_sign if sign.semester_id == 15]
-        if (professor_approved_at):
-            professor_approved_at = professor_approved_at[0].sign_time
-        else:
-            professor_approved_at = None
-
-    # 데이터 변환 로직
-    return {
-        "club_id": source_activity.club_id,
-        "original_name": source_activity.title,
-        "name": source_activity.title,
-        "activity_d_id": activity_d_id,
-        "activity_status_enum_id": source_activity.feedback_type,
-        "activity_type_enum_id": activity_type_enum_id,
-        "location": source_activity.location,
-        "purpose": source_activity.purpose,
-        "detail": source_activity.content,
-        "evidence": source_activity.proof_text or "",
-        "created_at": source_activity.recent_edit,
-        "updated_at": source_activity.recent_feedback or source_activity.recent_edit,
-        "professor_approved_at": professor_approved_at,
-    }
+    return transform_activity_batch([source_activity], activity_sign)[0]
+
+def transform_activity_batch(
+        source_activities: List[ActivityRow],
+        activity_sign: Dict[int, datetime.datetime]
+    ) -> List[Dict]:
+    """
+    activity 묶음을 한 번의 루프로 변환해 executemany 파라미터 목록으로 반환
+    activity_sign은 해당 club의 semester_id -> 최신 sign_time 맵
+    """
+    # activity_d_id = 7 일경우 14, 아닐경우 15학기의 서명 시각
+    professor_approved_at_by_d_id = {7: activity_sign.get(14), 2: activity_sign.get(15)}
+
+    transformed_activities = []
+    for source_activity in source_activities:
+        recent_edit = source_activity.recent_edit
+        activity_d_id = 7 if recent_edit < ACTIVITY_D_CUTOFF else 2
+
+        # 데이터 변환 로직
+        transformed_activities.append({
+            "club_id": source_activity.club_id,
+            "original_name": source_activity.title,
+            "name": source_activity.title,
+            "activity_d_id": activity_d_id,
+            "activity_status_enum_id": source_activity.feedback_type,
+            "activity_type_enum_id": activity_type_mapping.get(source_activity.activity_type_id, 2),
+            "location": source_activity.location,
+            "purpose": source_activity.purpose,
+            "detail": source_activity.content,
+            "evidence": source_activity.proof_text or "",
+            "created_at": recent_edit,
+            "updated_at": source_activity.recent_feedback or recent_edit,
+            "professor_approved_at": professor_approved_at_by_d_id[activity_d_id],
+        })
+    return transformed_activities
 
 def transform_activity_t(
-        source_activity: SourceActivity,
+        source_activity: ActivityRow,
         target_activity_id: int
     ) -> Dict:
-    return {
-        "activity_id": target_activity_id,
-        "start_term": source_activity.start_date,
-        "end_term": source_activity.end_date,
-        "created_at": source_activity.recent_edit,
-    }
+    return transform_activity_t_batch([source_activity], [target_activity_id])[0]
 
-def transform_activity_participants(
-        source_activity: SourceActivity,
-        target_students: List[TargetStudent],
-        target_activity_id: int
+def transform_activity_t_batch(
+        source_activities: List[ActivityRow],
+        target_activity_ids: List[int]
     ) -> List[Dict]:
     return [
         {
             "activity_id": target_activity_id,
-            "student_id": target_student.id,
+            "start_term": source_activity.start_date,
+            "end_term": source_activity.end_date,
             "created_at": source_activity.recent_edit,
         }
-        for target_student in target_students
+        for source_activity, target_activity_id in zip(source_activities, target_activity_ids)
     ]
 
+def transform_activity_participants(
+        source_activity: ActivityRow,
+        source_activity_participants: List[ActivityMemberRow],
+        identity_index: IdentityIndex,
+        target_activity_id: int
+    ) -> List[Dict]:
+    return transform_activity_participants_batch(
+        [source_activity], {source_activity.id: source_activity_participants}, identity_index, [target_activity_id]
+    )
+
+def transform_activity_participants_batch(
+        source_activities: List[ActivityRow],
+        source_activity_participants: Dict[int, List[ActivityMemberRow]],
+        identity_index: IdentityIndex,
+        target_activity_ids: List[int]
+    ) -> List[Dict]:
+    """source_activity_participants: 원본 activity id -> ActivityMember 목록"""
+    student_ids = identity_index.student_ids
+
+    transformed_participants = []
+    for source_activity, target_activity_id in zip(source_activities, target_activity_ids):
+        created_at = source_activity.recent_edit
+        for participant in source_activity_participants.get(source_activity.id, ()):
+            if participant.member_student_id in student_ids:
+                transformed_participants.append({
+                    "activity_id": target_activity_id,
+                    "student_id": student_ids[participant.member_student_id],
+                    "created_at": created_at,
+                })
+    return transformed_participants
+
 def transform_activity_feedbacks(
-        source_activity_feedbacks: List[SourceActivityFeedback],
-        target_executives: List[TargetExecutive],
+        source_activity_feedbacks: List[ActivityFeedbackRow],
+        identity_index: IdentityIndex,
         target_activity_id: int
     ) -> List[Dict]:
-    target_executive_map = {target_executive.student.number: target_executive.id for target_executive in target_executives}
+    return _transform_activity_feedback_lists([source_activity_feedbacks], identity_index, [target_activity_id])
 
-    return [
-        {
-            "activity_id": target_activity_id,
-            "executive_id": target_executive_map[source_activity_feedback.student_id],
-            "comment": source_activity_feedback.feedback,
-            "created_at": source_activity_feedback.added_time,
-        }
-        for source_activity_feedback in source_activity_feedbacks
-        if source_activity_feedback.feedback != ""
-    ]
+def transform_activity_feedbacks_batch(
+        source_activities: List[ActivityRow],
+        source_activity_feedbacks: Dict[int, List[ActivityFeedbackRow]],
+        identity_index: IdentityIndex,
+        target_activity_ids: List[int]
+    ) -> List[Dict]:
+    """source_activity_feedbacks: 원본 activity id -> ActivityFeedback 목록"""
+    return _transform_activity_feedback_lists(
+        [source_activity_feedbacks.get(source_activity.id, ()) for source_activity in source_activities],
+        identity_index,
+        target_activity_ids
+    )
+
+def _transform_activity_feedback_lists(
+        feedback_lists: List[List[ActivityFeedbackRow]],
+        identity_index: IdentityIndex,
+        target_activity_ids: List[int]
+    ) -> List[Dict]:
+    # row 단위 함수는 activity 없이 feedback 목록만 받으므로 activity별 feedback 목록을 순서대로 받는다
+    executive_ids = identity_index.executive_ids
+
+    transformed_feedbacks = []
+    for feedbacks, target_activity_id in zip(feedback_lists, target_activity_ids):
+        for source_activity_feedback in feedbacks:
+            if source_activity_feedback.feedback != "":
+                transformed_feedbacks.append({
+                    "activity_id": target_activity_id,
+                    "executive_id": executive_ids[source_activity_feedback.student_id],
+                    "comment": source_activity_feedback.feedback,
+                    "created_at": source_activity_feedback.added_time,
+                })
+    return transformed_feedbacks
+
+def transform_activity_rows(
+        identity_index: IdentityIndex,
+        source_activities: List[ActivityRow],
+        activity_sign: Dict[int, datetime.datetime],
+        source_activity_participants: Dict[int, List[ActivityMemberRow]],
+        source_activity_feedbacks: Dict[int, List[ActivityFeedbackRow]]
+    ) -> Dict[str, List[Dict]]:
+    """
+    activity 묶음과 하위 row를 한 번에 변환 (TransformPool에서 실행)
+    타겟 activity id는 insert 후에 정해지므로 하위 row의 activity_id에는 묶음 안에서의 위치를 넣는다.
+    """
+    positions = range(len(source_activities))
+    return {
+        "activities": transform_activity_batch(source_activities, activity_sign),
+        "activity_ts": transform_activity_t_batch(source_activities, positions),
+        "participants": transform_activity_participants_batch(source_activities, source_activity_participants, identity_index, positions),
+        "feedbacks": transform_activity_feedbacks_batch(source_activities, source_activity_feedbacks, identity_index, positions),
+    }
 
 async def transform_activity_evidence_files(
-        source_activity: SourceActivity,
-        source_activity_evidences: List,
-        target_activity_id: int
+        source_activity: ActivityRow,
+        source_activity_evidences: List[ActivityEvidenceRow],
+        evidence_transfer: EvidenceTransfer,
+        target_activity_id: int = None
     ) -> List[Dict]:
     """
     ActivityEvidence 파일들을 새로운 시스템으로 변환
@@ -113,88 +177,16 @@ async def transform_activity_evidence_files(
     3. 파일 업로드
     4. 결과 반환
     """
-    # tmp 디렉토리 초기화
-    TMP_DIR = "tmp"
-    if os.path.exists(TMP_DIR):
-        shutil.rmtree(TMP_DIR)
-    os.makedirs(TMP_DIR)
-
-    try:
-        # 파일 다운로드 및 메타데이터 준비
-        file_metadatas = []
-        downloaded_files = []
-        
-        async with aiohttp.ClientSession() as session:
-            for evidence in source_activity_evidences:
-                file_name = evidence.description
-                tmp_path = os.path.join(TMP_DIR, file_name)
-                
-                # 파일 다운로드
-                async with session.get(evidence.image_url) as response:
-                    if response.status != 200:
-                        raise Exception(f"Failed to download file: {file_name}")
-                    
-                    async with aiofiles.open(tmp_path, 'wb') as f:
-                        await f.write(await response.read())
-                
-                # 파일 메타데이터 준비
-                file_size = os.path.getsize(tmp_path)
-                file_type = file_name.split('.')[-1]
-                
-                file_metadatas.append({
-                    "name": file_name,
-                    "type": f"image/{file_type}",
-                    "size": file_size
-                })
-                downloaded_files.append(tmp_path)
-
-        # API를 통해 업로드 URL 획득
-        headers = {"Authorization": f"Bearer {API_ACCESS_TOKEN}"}
-        max_retries = 3
-        
-        async def try_api_call():
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{API_BASE_URL}/files/upload",
-                    json={"metadata": file_metadatas},
-                    headers=headers
-                ) as response:
-                    if response.status != 201:
-                        raise Exception("Failed to get upload URLs")
-                    return await response.json()
-
-        # API 호출 재시도 로직
-        for attempt in range(max_retries):
-            try:
-                api_response = await try_api_call()
-                break
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                await asyncio.sleep(1)
-
-        # 파일 업로드
-        results = []
-        for idx, url_info in enumerate(api_response["urls"]):
-            file_path = downloaded_files[idx]
-            
-            async with aiohttp.ClientSession() as session:
-                async with aiofiles.open(file_path, 'rb') as f:
-                    file_content = await f.read()
-                    
-                async with session.put(url_info["uploadUrl"], data=file_content) as response:
-                    if response.status != 200:
-                        raise Exception(f"Failed to upload file: {url_info['name']}")
-            
-            results.append({
-                "activity_id": target_activity_id,
-                "file_id": url_info["fileId"],
-                "created_at": source_activity.recent_edit
-            })
-
-        return results
-
-    finally:
-        # 임시 파일 정리
-        if os.path.exists(TMP_DIR):
-            shutil.rmtree(TMP_DIR)
+    file_ids = await evidence_transfer.transfer([
+        {"url": evidence.image_url, "name": evidence.description}
+        for evidence in source_activity_evidences
+    ])
+
+    return [
+        {
+            "activity_id": target_activity_id,
+            "file_id": file_id,
+            "created_at": source_activity.recent_edit
+        }
+        for file_id in file_ids
+    ]
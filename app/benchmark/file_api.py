@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+import itertools
+
+from aiohttp import web
+
+class FileApiStub:
+    """
+    벤치마크용 로컬 파일 API
+    - GET/HEAD /benchmark/files/{size}/{name}: 합성 증빙 원본 (이름마다 내용이 달라 해시 캐시에 걸리지 않는다)
+    - POST /files/upload: 업로드 URL 발급 (실제 API와 같은 요청/응답 형식)
+    - PUT /benchmark/uploads/{file_id}: 업로드 URL
+    엔드포인트마다 지정한 지연 시간(초)만큼 기다린 뒤 응답해 네트워크/스토리지 지연을 흉내 낸다.
+    """
+
+    def __init__(self, download_latency: float = 0, upload_url_latency: float = 0, upload_latency: float = 0):
+        self.download_latency = download_latency
+        self.upload_url_latency = upload_url_latency
+        self.upload_latency = upload_latency
+        self.file_ids = itertools.count(1)
+        self.upload_url_requests = 0
+        self.uploaded_files = 0
+        self.uploaded_bytes = 0
+        self.runner = None
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 3)
+        app.add_routes([
+            web.get("/benchmark/files/{size}/{name}", self.get_file),
+            web.post("/files/upload", self.request_upload_urls),
+            web.put("/benchmark/uploads/{file_id}", self.put_file),
+        ])
+        return app
+
+    async def start(self, host: str, port: int):
+        self.runner = web.AppRunner(self.make_app())
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def get_file(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.download_latency)
+        size = int(request.match_info["size"])
+        block = hashlib.sha256(request.match_info["name"].encode()).digest()
+        return web.Response(body=(block * (size // len(block) + 1))[:size])
+
+    async def request_upload_urls(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.upload_url_latency)
+        self.upload_url_requests += 1
+        urls = []
+        for metadata in (await request.json())["metadata"]:
+            file_id = f"benchmark-{next(self.file_ids)}"
+            urls.append({
+                "name": metadata["name"],
+                "uploadUrl": str(request.url.with_path(f"/benchmark/uploads/{file_id}")),
+                "fileId": file_id,
+            })
+        return web.json_response({"urls": urls}, status=201)
+
+    async def put_file(self, request: web.Request) -> web.Response:
+        size = 0
+        async for chunk in request.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+        await asyncio.sleep(self.upload_latency)
+        self.uploaded_files += 1
+        self.uploaded_bytes += size
+        return web.Response(status=200)
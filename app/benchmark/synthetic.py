@@ -0,0 +1,171 @@
+import datetime
+import random
+from dataclasses import dataclass
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.schema import CreateTable
+
+import app.activity.model.source as activity_source
+import app.activity.model.target as activity_target
+import app.funding.model.source as funding_source
+import app.funding.model.target as funding_target
+from app.common.util import chunked
+from config import INSERT_BATCH_SIZE
+
+SOURCE_METADATAS = (activity_source.Base.metadata, funding_source.Base.metadata)
+TARGET_METADATAS = (activity_target.Base.metadata, funding_target.Base.metadata)
+
+# 합성 학생 학번 시작값
+STUDENT_NUMBER_BASE = 20200000
+
+@dataclass
+class Scale:
+    """합성 원본 데이터 규모"""
+    clubs: int = 20
+    activities_per_club: int = 50
+    fundings_per_club: int = 50
+    members_per_activity: int = 5
+    evidences_per_activity: int = 2
+    evidences_per_funding: int = 3
+    students: int = 2000
+    executives: int = 50
+    file_size: int = 64 * 1024
+    seed: int = 1
+
+def _tables(metadatas):
+    # activity/funding 모델이 student, executive 같은 테이블을 각자 정의하므로 이름 기준으로 한 번씩만
+    tables = {}
+    for metadata in metadatas:
+        for table in metadata.tables.values():
+            tables.setdefault(table.name, table)
+    return list(tables.values())
+
+def recreate_schema(engine, metadatas):
+    """
+    모델 테이블을 지우고 다시 만든다.
+    원본 모델은 Club, Member 등 모델에 없는 테이블을 참조하므로 외래 키 제약 없이 만든다.
+    """
+    tables = _tables(metadatas)
+    with engine.begin() as connection:
+        for table in reversed(tables):
+            table.drop(connection, checkfirst=True)
+        for table in tables:
+            connection.execute(CreateTable(table, include_foreign_key_constraints=[]))
+
+def _insert(connection, table, rows: List[Dict]):
+    for chunk in chunked(rows, INSERT_BATCH_SIZE):
+        connection.execute(insert(table), chunk)
+
+def seed_target_identities(target_engine, scale: Scale):
+    """identity 인덱스가 읽는 타겟 student/executive를 만든다."""
+    students = [
+        {"id": index + 1, "number": STUDENT_NUMBER_BASE + index, "name": f"student{index}"}
+        for index in range(scale.students)
+    ]
+    executives = [
+        {"id": index + 1, "student_id": index + 1, "name": f"executive{index}"}
+        for index in range(min(scale.executives, scale.students))
+    ]
+    with target_engine.begin() as connection:
+        _insert(connection, activity_target.Student.__table__, students)
+        _insert(connection, activity_target.Executive.__table__, executives)
+
+def evidence_url(file_api_url: str, name: str, size: int) -> str:
+    return f"{file_api_url}/benchmark/files/{size}/{name}"
+
+def seed_source(source_engine, scale: Scale, file_api_url: str) -> Dict[str, int]:
+    """
+    원본 activity/funding과 하위 row를 scale만큼 만들고 테이블별 row 수를 반환한다.
+    타입 id 등은 변환의 분기가 골고루 실행되도록 섞고, 증빙 URL은 file_api_url의 스텁을 가리킨다.
+    """
+    rng = random.Random(scale.seed)
+    student_numbers = [STUDENT_NUMBER_BASE + index for index in range(scale.students)]
+    executive_numbers = student_numbers[:scale.executives] or student_numbers
+    rows = {table: [] for table in (
+        "ActivitySign", "Activity", "ActivityMember", "ActivityFeedback", "ActivityEvidence",
+        "Funding", "FundingFixture", "FundingEvidence", "FundingTransportationMember", "FundingFeedback",
+    )}
+
+    activity_id = 0
+    funding_id = 0
+    funding_evidence_id = 0
+    for club_id in range(1, scale.clubs + 1):
+        for semester_id in (14, 15):
+            rows["ActivitySign"].append({
+                "semester_id": semester_id, "club_id": club_id,
+                "sign_time": datetime.datetime(2023 + semester_id - 14, 6, 1 + club_id % 28),
+            })
+
+        club_activity_ids = []
+        for _ in range(scale.activities_per_club):
+            activity_id += 1
+            club_activity_ids.append(activity_id)
+            start_date = datetime.date(2023, 1, 1) + datetime.timedelta(days=rng.randrange(730))
+            recent_edit = datetime.datetime.combine(start_date, datetime.time(12)) + datetime.timedelta(days=rng.randrange(30))
+            rows["Activity"].append({
+                "id": activity_id, "club_id": club_id, "title": f"activity {activity_id}",
+                "activity_type_id": rng.randint(1, 3), "start_date": start_date,
+                "end_date": start_date + datetime.timedelta(days=rng.randrange(3)),
+                "location": "location", "purpose": "purpose " * 10, "content": "content " * 50,
+                "proof_text": rng.choice([None, "proof"]), "feedback_type": rng.randint(1, 3),
+                "recent_edit": recent_edit,
+                "recent_feedback": rng.choice([None, recent_edit + datetime.timedelta(days=7)]),
+            })
+            for student_number in rng.sample(student_numbers, min(scale.members_per_activity, len(student_numbers))):
+                rows["ActivityMember"].append({"activity_id": activity_id, "member_student_id": student_number})
+            rows["ActivityFeedback"].append({
+                "activity": activity_id, "student_id": rng.choice(executive_numbers),
+                "added_time": recent_edit + datetime.timedelta(days=1), "feedback": "feedback",
+            })
+            for index in range(scale.evidences_per_activity):
+                name = f"activity-{activity_id}-{index}.png"
+                rows["ActivityEvidence"].append({
+                    "activity_id": activity_id, "image_url": evidence_url(file_api_url, name, scale.file_size),
+                    "description": name,
+                })
+
+        for _ in range(scale.fundings_per_club):
+            funding_id += 1
+            is_transportation = rng.random() < 0.3
+            expenditure_date = datetime.date(2023, 1, 1) + datetime.timedelta(days=rng.randrange(730))
+            rows["Funding"].append({
+                "id": funding_id, "name": f"funding {funding_id}", "club_id": club_id,
+                "semester_id": rng.choice((14, 15)), "expenditure_date": expenditure_date,
+                "expenditure_amount": rng.randrange(1000, 500000), "approved_amount": rng.randrange(0, 500000),
+                "purpose": str(rng.choice(club_activity_ids)) if club_activity_ids else "",
+                "is_transportation": is_transportation, "is_non_corporate_transaction": False,
+                "is_food_expense": rng.random() < 0.3, "is_labor_contract": False,
+                "is_external_event_participation_fee": False, "is_publication": False,
+                "is_profit_making_activity": False, "is_joint_expense": False,
+                "additional_explanation": rng.choice([None, "explanation"]),
+                "funding_feedback_type": rng.randint(1, 4), "is_committee": False,
+                "recent_edit": datetime.datetime.combine(expenditure_date, datetime.time(12)),
+            })
+            if rng.random() < 0.5:
+                rows["FundingFixture"].append({
+                    "funding_id": funding_id, "funding_fixture_type_id": rng.randint(1, 4),
+                    "fixture_name": "fixture", "fixture_type_id": rng.randint(1, 4),
+                    "usage_purpose": "usage", "is_software": rng.random() < 0.2,
+                })
+            for index in range(scale.evidences_per_funding):
+                funding_evidence_id += 1
+                name = f"funding-{funding_id}-{index}.jpg"
+                rows["FundingEvidence"].append({
+                    "id": funding_evidence_id, "funding_id": funding_id,
+                    "funding_evidence_type_id": (funding_id + index) % 5 + 1,
+                    "image_url": evidence_url(file_api_url, name, scale.file_size), "description": name,
+                })
+            if is_transportation:
+                for student_number in rng.sample(student_numbers, min(3, len(student_numbers))):
+                    rows["FundingTransportationMember"].append({"funding_id": funding_id, "student_id": student_number})
+            rows["FundingFeedback"].append({
+                "funding": funding_id, "student_id": rng.choice(executive_numbers),
+                "added_time": datetime.datetime.combine(expenditure_date, datetime.time(18)), "feedback": "feedback",
+            })
+
+    tables = {table.name: table for table in _tables(SOURCE_METADATAS)}
+    with source_engine.begin() as connection:
+        for table_name, table_rows in rows.items():
+            _insert(connection, tables[table_name], table_rows)
+    return {table_name: len(table_rows) for table_name, table_rows in rows.items()}
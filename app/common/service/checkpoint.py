@@ -0,0 +1,103 @@
+import datetime
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from config import CHECKPOINT_PATH
+
+class CheckpointStore:
+    """
+    마이그레이션 진행 상황을 로컬 SQLite 파일에 기록하는 저널
+    - completed_club: 끝까지 마이그레이션된 club
+    - migrated_row: 타겟에 커밋된 원본 row id -> 타겟 row id
+      (funding 마이그레이션이 purpose activity의 타겟 id를 찾는 매핑으로도 사용)
+    - watermark: 마지막으로 끝까지 반영된 원본 recent_edit/recent_feedback 시각 (증분 동기화 기준)
+    재실행 시 완료된 club은 건너뛰고, 중간에 멈춘 club은 기록되지 않은 row만 이어서 처리한다.
+    기록은 타겟 커밋 이후에 하므로 커밋 직후 프로세스가 죽은 경우에만 해당 묶음이 다시 처리될 수 있다.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS completed_club ("
+                "entity TEXT NOT NULL, club_id INTEGER NOT NULL, completed_at TEXT NOT NULL, "
+                "PRIMARY KEY (entity, club_id))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS migrated_row ("
+                "entity TEXT NOT NULL, source_id INTEGER NOT NULL, target_id INTEGER NOT NULL, club_id INTEGER, "
+                "PRIMARY KEY (entity, source_id))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS migrated_row_club ON migrated_row (entity, club_id)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS watermark ("
+                "entity TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at TEXT NOT NULL)"
+            )
+
+    def completed_clubs(self, entity: str) -> Set[int]:
+        with self.lock:
+            rows = self.connection.execute("SELECT club_id FROM completed_club WHERE entity = ?", (entity,)).fetchall()
+        return {club_id for club_id, in rows}
+
+    def mark_club_completed(self, entity: str, club_id: int):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO completed_club (entity, club_id, completed_at) VALUES (?, ?, ?)",
+                (entity, club_id, datetime.datetime.now().isoformat())
+            )
+
+    def is_club_completed(self, entity: str, club_id: int) -> bool:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM completed_club WHERE entity = ? AND club_id = ?", (entity, club_id)
+            ).fetchone()
+        return row is not None
+
+    def unmark_clubs_completed(self, entity: str, club_ids: Iterable[int]):
+        """club을 다시 미완료로 돌린다. (증분 동기화할 변경이 생긴 club, dead letter만 다시 처리한 club)"""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM completed_club WHERE entity = ? AND club_id = ?",
+                [(entity, club_id) for club_id in club_ids]
+            )
+
+    def migrated_rows(self, entity: str, club_id: int = None) -> Dict[int, int]:
+        query = "SELECT source_id, target_id FROM migrated_row WHERE entity = ?"
+        params = (entity,)
+        if club_id is not None:
+            query += " AND club_id = ?"
+            params += (club_id,)
+        with self.lock:
+            return dict(self.connection.execute(query, params).fetchall())
+
+    def record_rows(self, entity: str, club_id: int, rows: Iterable[Tuple[int, int]]):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO migrated_row (entity, source_id, target_id, club_id) VALUES (?, ?, ?, ?)",
+                [(entity, source_id, target_id, club_id) for source_id, target_id in rows]
+            )
+
+    def watermark(self, entity: str) -> Optional[datetime.datetime]:
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM watermark WHERE entity = ?", (entity,)).fetchone()
+        return datetime.datetime.fromisoformat(row[0]) if row else None
+
+    def set_watermark(self, entity: str, value: datetime.datetime):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO watermark (entity, value, updated_at) VALUES (?, ?, ?)",
+                (entity, value.isoformat(), datetime.datetime.now().isoformat())
+            )
+
+    def reset(self, entity: str):
+        """entity의 진행 기록을 모두 지워 처음부터 다시 마이그레이션하게 한다."""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM completed_club WHERE entity = ?", (entity,))
+            self.connection.execute("DELETE FROM migrated_row WHERE entity = ?", (entity,))
+            self.connection.execute("DELETE FROM watermark WHERE entity = ?", (entity,))
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from app.common.service.metrics import metrics
+from config import SourceSession, TargetSession, AsyncSourceSession, AsyncTargetSession, COMMIT_BATCH_ROWS, COMMIT_INTERVAL
+
+def open_source_session():
+    """비동기 엔진이 설정되어 있으면 AsyncSession, 아니면 동기 Session을 연다."""
+    return (AsyncSourceSession or SourceSession)()
+
+def open_target_session():
+    """비동기 엔진이 설정되어 있으면 AsyncSession, 아니면 동기 Session을 연다."""
+    return (AsyncTargetSession or TargetSession)()
+
+def is_async_session(session) -> bool:
+    return hasattr(session, "run_sync")
+
+async def run_db(session, fn, *args):
+    """
+    session을 첫 인자로 받는 동기 DB 함수를 이벤트 루프를 막지 않고 실행
+    AsyncSession이면 run_sync로 드라이버의 비동기 I/O 위에서, 동기 Session이면 스레드에서 실행한다.
+    """
+    if is_async_session(session):
+        return await session.run_sync(fn, *args)
+    return await asyncio.to_thread(fn, session, *args)
+
+async def commit_session(session):
+    with metrics.timed("commit"):
+        if is_async_session(session):
+            await session.commit()
+        else:
+            await asyncio.to_thread(session.commit)
+
+async def rollback_session(session):
+    if is_async_session(session):
+        await session.rollback()
+    else:
+        await asyncio.to_thread(session.rollback)
+
+async def close_session(session):
+    if is_async_session(session):
+        await session.close()
+    else:
+        await asyncio.to_thread(session.close)
+
+class ChunkedCommitter:
+    """
+    세션에 쓴 결과를 모아 두었다가 rows개 이상 쌓이거나 마지막 커밋 후 interval초가 지나면 커밋하고,
+    커밋된 결과로 on_commit을 호출한다. (club 전체를 한 트랜잭션으로 두지 않아 타겟 DB의 undo log와 잠금 시간이 묶음 크기로 제한된다)
+    다음 묶음이 늦게 와도(증빙 전송 대기 등) 트랜잭션이 interval초 넘게 열려 있지 않도록 타이머로도 커밋한다.
+    쓰기와 타이머 커밋이 같은 세션에서 겹치지 않도록 쓰기는 write로 lock 안에서 실행한다.
+    커밋이 실패하면 세션을 되돌리고 쌓인 결과를 버리며, 이후의 write/flush는 같은 예외를 올린다.
+    """
+
+    def __init__(self, session, on_commit, rows: int = COMMIT_BATCH_ROWS, interval: float = COMMIT_INTERVAL):
+        self.session = session
+        self.on_commit = on_commit
+        self.rows = rows
+        self.interval = interval
+        self.pending = []
+        self.committed = 0
+        self.last_commit = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.timer = None
+        self.error = None
+
+    async def write(self, fn, *args):
+        """fn(session, *args)를 실행하고 반환된 결과를 커밋 대기 목록에 더한 뒤 반환한다."""
+        async with self.lock:
+            if self.error is not None:
+                raise self.error
+            results = await run_db(self.session, fn, *args)
+            self.pending.extend(results)
+            if len(self.pending) >= self.rows or time.monotonic() - self.last_commit >= self.interval:
+                await self._commit()
+            elif self.pending and self.timer is None:
+                self.timer = asyncio.get_running_loop().create_task(self._commit_later())
+        return results
+
+    async def flush(self):
+        async with self.lock:
+            await self._commit()
+
+    async def _commit_later(self):
+        await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - self.last_commit)))
+        async with self.lock:
+            try:
+                await self._commit()
+            except Exception:
+                # self.error에 남아 다음 write/flush에서 올라간다
+                pass
+
+    async def _commit(self):
+        if self.timer is not None and self.timer is not asyncio.current_task():
+            self.timer.cancel()
+        self.timer = None
+        if self.error is not None:
+            raise self.error
+
+        pending, self.pending = self.pending, []
+        self.last_commit = time.monotonic()
+        if not pending:
+            return
+        try:
+            await commit_session(self.session)
+        except Exception as e:
+            self.error = e
+            await rollback_session(self.session)
+            raise
+        self.on_commit(pending)
+        self.committed += len(pending)
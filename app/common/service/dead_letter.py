@@ -0,0 +1,83 @@
+import datetime
+import json
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from config import DEAD_LETTER_PATH
+
+class DeadLetterStore:
+    """
+    마이그레이션하지 못한 원본 row를 로컬 SQLite 파일에 남기는 기록
+    - dead_letter: entity, 원본 id -> club_id, 실패한 단계, 오류, 전송하지 못한 증빙 URL(JSON 목록), 시도 횟수
+    실패한 row는 묶음에서 빠지고 나머지 row는 그대로 커밋된다.
+    같은 row가 다시 실패하면 오류와 시도 횟수를 갱신하고, 이후 커밋되면 기록을 지운다.
+    replay.py는 여기 남은 row만 다시 마이그레이션한다.
+    """
+
+    def __init__(self, path: str = DEAD_LETTER_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        # 이번 실행에서 기록한 실패 수
+        self.count = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS dead_letter ("
+                "entity TEXT NOT NULL, source_id INTEGER NOT NULL, club_id INTEGER, stage TEXT NOT NULL, error TEXT NOT NULL, "
+                "evidence_urls TEXT NOT NULL, attempts INTEGER NOT NULL, failed_at TEXT NOT NULL, "
+                "PRIMARY KEY (entity, source_id))"
+            )
+
+    def record(self, entity: str, club_id: int, source_id: int, stage: str, error: Exception, evidence_urls: Iterable[str] = ()):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO dead_letter (entity, source_id, club_id, stage, error, evidence_urls, attempts, failed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (entity, source_id) DO UPDATE SET club_id = excluded.club_id, stage = excluded.stage, "
+                "error = excluded.error, evidence_urls = excluded.evidence_urls, attempts = attempts + 1, failed_at = excluded.failed_at",
+                (
+                    entity, source_id, club_id, stage, f"{type(error).__name__}: {error}",
+                    json.dumps(list(evidence_urls), ensure_ascii=False), datetime.datetime.now().isoformat()
+                )
+            )
+            self.count += 1
+
+    def resolve(self, entity: str, source_ids: Iterable[int]):
+        """커밋된 row의 기록을 지운다."""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM dead_letter WHERE entity = ? AND source_id = ?",
+                ((entity, source_id) for source_id in source_ids)
+            )
+
+    def pending(self, entity: str) -> Dict[int, List[int]]:
+        """entity의 남은 원본 id를 club_id -> [원본 id] 형태로 반환"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT club_id, source_id FROM dead_letter WHERE entity = ? ORDER BY source_id", (entity,)
+            ).fetchall()
+        pending = defaultdict(list)
+        for club_id, source_id in rows:
+            pending[club_id].append(source_id)
+        return dict(pending)
+
+    def entries(self, entities: Iterable[str]) -> List[Dict]:
+        entities = list(entities)
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT entity, club_id, source_id, stage, error, evidence_urls, attempts, failed_at FROM dead_letter "
+                f"WHERE entity IN ({', '.join('?' for _ in entities)}) ORDER BY entity, club_id, source_id",
+                entities
+            ).fetchall()
+        return [
+            {
+                "entity": entity, "club_id": club_id, "source_id": source_id, "stage": stage, "error": error,
+                "evidence_urls": json.loads(evidence_urls), "attempts": attempts, "failed_at": failed_at,
+            }
+            for entity, club_id, source_id, stage, error, evidence_urls, attempts, failed_at in rows
+        ]
+
+    def close(self):
+        self.connection.close()
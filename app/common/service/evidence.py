@@ -0,0 +1,391 @@
+import asyncio
+import datetime
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiofiles
+import aiohttp
+
+from app.common.service.metrics import metrics
+
+from config import (
+    API_ACCESS_TOKEN,
+    API_BASE_URL,
+    EVIDENCE_TRANSFER_CONCURRENCY,
+    EVIDENCE_STREAMING,
+    EVIDENCE_CACHE_PATH,
+    UPLOAD_URL_BATCH_SIZE,
+    UPLOAD_URL_BATCH_BYTES,
+    UPLOAD_URL_BATCH_LINGER,
+)
+
+# 스트리밍 시 HEAD로 받은 크기와 실제 본문 크기가 같도록 압축 전송을 끈다
+IDENTITY_ENCODING = {"Accept-Encoding": "identity"}
+STREAM_CHUNK_SIZE = 64 * 1024
+
+async def gather_settled(*aws):
+    """
+    모든 작업이 끝날 때까지(성공이든 실패든) 기다린 뒤 결과를 반환하고, 실패한 작업이 있으면 첫 예외를 올린다.
+    하나가 실패해도 나머지가 임시 파일이나 캐시를 쓰는 중에 정리 코드가 먼저 실행되지 않도록 한다.
+    """
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+class FileIdCache:
+    """
+    원본 증빙 URL / 파일 내용 해시(SHA-256) -> 업로드된 fileId 캐시
+    로컬 SQLite 파일에 저장해 여러 실행에 걸쳐 유지하고, 조회는 시작 시 메모리에 올린 dict로 한다.
+    타겟 DB가 아니라 파일 서버의 상태를 가리키므로 체크포인트와 별도 파일로 관리한다.
+    """
+
+    def __init__(self, path: str = EVIDENCE_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS file_cache ("
+                "source_url TEXT PRIMARY KEY, content_hash TEXT, file_id TEXT NOT NULL, size INTEGER, created_at TEXT NOT NULL)"
+            )
+            rows = self.connection.execute("SELECT source_url, content_hash, file_id FROM file_cache").fetchall()
+        self.by_url = {source_url: file_id for source_url, _, file_id in rows}
+        self.by_hash = {content_hash: file_id for _, content_hash, file_id in rows if content_hash}
+
+    def get_by_url(self, source_url: str) -> Optional[str]:
+        return self.by_url.get(source_url)
+
+    def get_by_hash(self, content_hash: str) -> Optional[str]:
+        return self.by_hash.get(content_hash)
+
+    def put(self, source_url: str, content_hash: Optional[str], file_id: str, size: int = None):
+        self.by_url[source_url] = file_id
+        if content_hash:
+            self.by_hash.setdefault(content_hash, file_id)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO file_cache (source_url, content_hash, file_id, size, created_at) VALUES (?, ?, ?, ?, ?)",
+                (source_url, content_hash, file_id, size, datetime.datetime.now().isoformat())
+            )
+
+    def close(self):
+        self.connection.close()
+
+class UploadUrlBatcher:
+    """
+    여러 전송(activity/funding)의 파일 메타데이터를 모아 /files/upload 한 번으로 업로드 URL을 발급받는다.
+    모인 파일 수나 크기 합이 한도를 넘거나, 첫 요청 후 linger초가 지나면 모아 둔 만큼 요청하고
+    응답의 urls를 요청 순서대로 각 호출자에게 돌려준다.
+    여러 호출자의 파일을 묶은 요청이 실패하면 호출자 단위로 반씩 나눠 다시 요청해, 실패의 원인이 된 파일의 호출자만 예외를 받는다.
+    """
+
+    def __init__(
+            self,
+            request_upload_urls: Callable[[List[Dict]], Awaitable[List[Dict]]],
+            max_count: int = UPLOAD_URL_BATCH_SIZE,
+            max_bytes: int = UPLOAD_URL_BATCH_BYTES,
+            linger: float = UPLOAD_URL_BATCH_LINGER
+        ):
+        self.request_upload_urls = request_upload_urls
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.linger = linger
+        # (호출자, 파일 메타데이터, 결과를 받을 Future)
+        self.pending: List[Tuple[object, Dict, asyncio.Future]] = []
+        self.pending_bytes = 0
+        self.linger_handle = None
+        self.tasks = set()
+
+    async def request(self, file_metadatas: List[Dict]) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        caller = object()
+        futures = []
+        for file_metadata in file_metadatas:
+            future = loop.create_future()
+            futures.append(future)
+            self.pending.append((caller, file_metadata, future))
+            self.pending_bytes += file_metadata["size"]
+            if len(self.pending) >= self.max_count or self.pending_bytes >= self.max_bytes:
+                self.flush()
+
+        if self.pending and self.linger_handle is None:
+            self.linger_handle = loop.call_later(self.linger, self.flush)
+
+        return list(await asyncio.gather(*futures))
+
+    def flush(self):
+        if self.linger_handle is not None:
+            self.linger_handle.cancel()
+            self.linger_handle = None
+        if not self.pending:
+            return
+
+        batch, self.pending, self.pending_bytes = self.pending, [], 0
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _send(self, batch: List[Tuple[object, Dict, asyncio.Future]]):
+        try:
+            url_infos = await self.request_upload_urls([file_metadata for _, file_metadata, _ in batch])
+            if len(url_infos) != len(batch):
+                raise Exception(f"Upload URL count mismatch: requested {len(batch)}, received {len(url_infos)}")
+        except Exception as e:
+            callers = list(dict.fromkeys(caller for caller, _, _ in batch))
+            if len(callers) > 1:
+                # 다른 호출자의 파일 때문에 실패했을 수 있으므로 호출자 단위로 반씩 나눠 다시 요청한다
+                metrics.incr("upload_url_batch_split")
+                first_half = set(callers[:len(callers) // 2])
+                await asyncio.gather(
+                    self._send([entry for entry in batch if entry[0] in first_half]),
+                    self._send([entry for entry in batch if entry[0] not in first_half])
+                )
+                return
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), url_info in zip(batch, url_infos):
+            if not future.done():
+                future.set_result(url_info)
+
+class EvidenceTransfer:
+    """
+    증빙 파일 다운로드 -> 업로드 URL 발급 -> PUT 업로드를 담당하는 클라이언트
+    실행 전체에서 하나의 aiohttp 세션(커넥션 풀)을 공유하고,
+    동시에 진행되는 다운로드/업로드 수를 세마포어로 제한한다.
+    이미 올린 파일(같은 URL 또는 같은 내용)은 FileIdCache의 fileId를 그대로 연결한다.
+    내용 해시는 업로드 전에 파일을 받아 둔 경우에만 확인하므로 streaming이면 크기를 알 수 없는 파일만 내용으로 중복을 찾는다.
+    """
+
+    def __init__(
+            self,
+            concurrency: int = EVIDENCE_TRANSFER_CONCURRENCY,
+            max_retries: int = 3,
+            streaming: bool = EVIDENCE_STREAMING,
+            cache: FileIdCache = None
+        ):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.streaming = streaming
+        self.cache = cache if cache is not None else FileIdCache()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.session = None
+        self.upload_url_batcher = UploadUrlBatcher(self.request_upload_urls)
+        # 다른 전송에서 올리는 중인 URL -> fileId를 받을 Future
+        self.in_flight: Dict[str, asyncio.Future] = {}
+
+    async def __aenter__(self) -> "EvidenceTransfer":
+        # 스트리밍 전송 하나가 GET/PUT 커넥션 두 개를 동시에 쓰므로 풀은 동시 진행 수의 두 배
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency * 2))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.upload_url_batcher.flush()
+        if self.upload_url_batcher.tasks:
+            await asyncio.gather(*self.upload_url_batcher.tasks, return_exceptions=True)
+        await self.session.close()
+
+    async def probe_size(self, url: str) -> Optional[int]:
+        """HEAD 요청으로 파일 크기를 확인한다. 알 수 없으면 None"""
+        async with self.semaphore:
+            with metrics.timed("evidence_probe"):
+                try:
+                    async with self.session.head(url, headers=IDENTITY_ENCODING, allow_redirects=True) as response:
+                        if response.status != 200:
+                            return None
+                        return response.content_length
+                except aiohttp.ClientError:
+                    return None
+
+    async def download(self, url: str, path: str) -> Tuple[int, str]:
+        """파일을 path에 받아 두고 (크기, 내용 해시)를 반환"""
+        content_hash = hashlib.sha256()
+        async with self.semaphore:
+            with metrics.timed("evidence_download", items=1) as timer:
+                async with self.session.get(url) as response:
+                    if response.status != 200:
+                        raise Exception(f"Failed to download file: {url}")
+
+                    async with aiofiles.open(path, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                            content_hash.update(chunk)
+                            await f.write(chunk)
+                timer.bytes = os.path.getsize(path)
+        return timer.bytes, content_hash.hexdigest()
+
+    async def request_upload_urls(self, file_metadatas: List[Dict]) -> List[Dict]:
+        headers = {"Authorization": f"Bearer {API_ACCESS_TOKEN}"}
+
+        # API 호출 재시도 로직
+        for attempt in range(self.max_retries):
+            try:
+                with metrics.timed("upload_url_api", items=len(file_metadatas)):
+                    async with self.session.post(
+                        f"{API_BASE_URL}/files/upload",
+                        json={"metadata": file_metadatas},
+                        headers=headers
+                    ) as response:
+                        if response.status != 201:
+                            raise Exception("Failed to get upload URLs")
+                        return (await response.json())["urls"]
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    raise e
+                await asyncio.sleep(1)
+
+    async def upload(self, url_info: Dict, path: str):
+        async with self.semaphore:
+            # 파일 객체를 넘기면 aiohttp가 chunk 단위로 읽어서 보낸다
+            with metrics.timed("evidence_upload", items=1, size=os.path.getsize(path)), open(path, 'rb') as f:
+                async with self.session.put(url_info["uploadUrl"], data=f) as response:
+                    if response.status != 200:
+                        raise Exception(f"Failed to upload file: {url_info['name']}")
+
+    async def stream(self, url: str, url_info: Dict, size: int) -> str:
+        """GET 응답 본문을 디스크나 메모리에 모으지 않고 chunk 단위로 바로 PUT 업로드한 뒤 내용 해시를 반환한다."""
+        content_hash = hashlib.sha256()
+
+        async def hashed_chunks(response):
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                content_hash.update(chunk)
+                yield chunk
+
+        async with self.semaphore:
+            with metrics.timed("evidence_stream", items=1, size=size):
+                async with self.session.get(url, headers=IDENTITY_ENCODING) as response:
+                    if response.status != 200:
+                        raise Exception(f"Failed to download file: {url}")
+                    if response.content_length is not None and response.content_length != size:
+                        raise Exception(f"File size changed during transfer: {url}")
+
+                    async with self.session.put(
+                        url_info["uploadUrl"],
+                        data=hashed_chunks(response),
+                        headers={"Content-Length": str(size)}
+                    ) as upload_response:
+                        if upload_response.status != 200:
+                            raise Exception(f"Failed to upload file: {url_info['name']}")
+        return content_hash.hexdigest()
+
+    async def transfer(self, files: List[Dict]) -> List[str]:
+        """
+        files: [{"url": 원본 파일 URL, "name": 파일 이름}, ...]
+        캐시에 있는 URL은 네트워크 없이 기존 fileId를 쓰고, 다른 전송에서 올리는 중인 URL은 그 결과를 기다린다.
+        나머지 URL만 한 번씩 올리며, 같은 URL이 여러 항목에 있으면 같은 fileId를 공유한다.
+        입력 순서대로 새 시스템의 fileId 목록을 반환한다.
+        """
+        if not files:
+            return []
+
+        names = {}
+        for file in files:
+            names.setdefault(file["url"], file["name"])
+
+        file_ids = {}
+        waiting = {}
+        owned_urls = []
+        for url in names:
+            cached_file_id = self.cache.get_by_url(url)
+            if cached_file_id:
+                file_ids[url] = cached_file_id
+                metrics.incr("evidence_cache_url_hit")
+            elif url in self.in_flight:
+                waiting[url] = self.in_flight[url]
+            else:
+                self.in_flight[url] = asyncio.get_running_loop().create_future()
+                owned_urls.append(url)
+
+        try:
+            file_ids.update(await self._upload_new(owned_urls, names))
+        except Exception as e:
+            for url in owned_urls:
+                future = self.in_flight.pop(url)
+                future.set_exception(e)
+                # 기다리는 전송이 없어도 경고가 남지 않도록 예외를 회수해 둔다
+                future.exception()
+            raise
+        for url in owned_urls:
+            self.in_flight.pop(url).set_result(file_ids[url])
+
+        for url, future in waiting.items():
+            file_ids[url] = await future
+
+        return [file_ids[file["url"]] for file in files]
+
+    async def _upload_new(self, urls: List[str], names: Dict[str, str]) -> Dict[str, str]:
+        """
+        URL들을 새로 올리고 URL -> fileId를 반환
+        스트리밍 모드에서는 HEAD로 크기를 먼저 확인하고 다운로드 본문을 그대로 업로드로 흘려보낸다.
+        크기를 알 수 없는 파일만 임시 파일로 받아 두었다가, 내용 해시가 캐시에 있으면 업로드 없이 연결한다.
+        스트리밍한 파일의 해시는 업로드 후에 캐시에 남아 이후 받아 둔 파일의 중복 확인에만 쓰인다.
+        """
+        if not urls:
+            return {}
+
+        if self.streaming:
+            sizes = dict(zip(urls, await asyncio.gather(*(self.probe_size(url) for url in urls))))
+        else:
+            sizes = dict.fromkeys(urls)
+
+        # 크기를 알 수 없는 파일만 임시 디렉토리에 다운로드 (동시 진행)
+        spooled_urls = [url for url in urls if sizes[url] is None]
+        tmp_dir = tempfile.mkdtemp() if spooled_urls else None
+        try:
+            paths = {url: os.path.join(tmp_dir, str(idx)) for idx, url in enumerate(spooled_urls)}
+            downloaded = await gather_settled(*(self.download(url, paths[url]) for url in spooled_urls))
+            content_hashes = {}
+            for url, (size, content_hash) in zip(spooled_urls, downloaded):
+                sizes[url] = size
+                content_hashes[url] = content_hash
+
+            # 내용이 같은 파일이 이미 올라가 있으면 업로드 생략
+            file_ids = {}
+            for url in spooled_urls:
+                cached_file_id = self.cache.get_by_hash(content_hashes[url])
+                if cached_file_id:
+                    file_ids[url] = cached_file_id
+                    metrics.incr("evidence_cache_hash_hit")
+                    self.cache.put(url, content_hashes[url], cached_file_id, sizes[url])
+
+            pending_urls = [url for url in urls if url not in file_ids]
+            if not pending_urls:
+                return file_ids
+
+            # 파일 메타데이터 준비
+            file_metadatas = [
+                {
+                    "name": names[url],
+                    "type": f"image/{names[url].split('.')[-1]}",
+                    "size": sizes[url],
+                }
+                for url in pending_urls
+            ]
+
+            # API를 통해 업로드 URL 획득 (다른 전송의 요청과 묶어서 발급)
+            url_infos = await self.upload_url_batcher.request(file_metadatas)
+
+            # 파일 업로드 (동시 진행)
+            async def upload_one(url, url_info):
+                if url in paths:
+                    await self.upload(url_info, paths[url])
+                else:
+                    content_hashes[url] = await self.stream(url, url_info, sizes[url])
+                self.cache.put(url, content_hashes[url], url_info["fileId"], sizes[url])
+
+            await gather_settled(*(upload_one(url, url_info) for url, url_info in zip(pending_urls, url_infos)))
+        finally:
+            # gather_settled로 모든 다운로드/업로드가 끝난 뒤에만 지운다
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        file_ids.update((url, url_info["fileId"]) for url, url_info in zip(pending_urls, url_infos))
+        return file_ids
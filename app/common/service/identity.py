@@ -0,0 +1,47 @@
+from typing import Dict, Optional
+
+from app.activity.model.target import Student as TargetStudent
+from app.activity.model.target import Executive as TargetExecutive
+from app.common.service.metrics import metrics
+
+class IdentityIndex:
+    """
+    타겟 student/executive 테이블을 학번 기준으로 메모리에 올려둔 인덱스
+    activity, funding 마이그레이션이 같은 인덱스를 공유해 row마다 반복되던 조회를 없앤다.
+    """
+
+    def __init__(self):
+        self.student_ids: Dict[int, int] = {}
+        self.executive_ids: Dict[int, int] = {}
+        self.loaded = False
+
+    def load(self, target_session) -> "IdentityIndex":
+        with metrics.timed("target_lookup") as timer:
+            # 학번 -> student.id
+            target_students = target_session.query(TargetStudent.number, TargetStudent.id) \
+                .filter(TargetStudent.number.isnot(None)).all()
+            self.student_ids = {number: student_id for number, student_id in target_students}
+
+            # 학번 -> executive.id (한 학생에 executive가 여러 개면 마지막 것을 사용)
+            target_executives = target_session.query(TargetStudent.number, TargetExecutive.id) \
+                .join(TargetExecutive, TargetExecutive.student_id == TargetStudent.id) \
+                .order_by(TargetExecutive.id).all()
+            self.executive_ids = {number: executive_id for number, executive_id in target_executives}
+            timer.items = len(target_students) + len(target_executives)
+
+        self.loaded = True
+        return self
+
+    def student_id(self, number: int) -> Optional[int]:
+        return self.student_ids.get(number)
+
+    def executive_id(self, number: int) -> Optional[int]:
+        return self.executive_ids.get(number)
+
+_identity_index = IdentityIndex()
+
+def get_identity_index(target_session, refresh: bool = False) -> IdentityIndex:
+    """프로세스 전체에서 공유하는 인덱스를 반환한다. 처음 호출되거나 refresh=True면 타겟 DB에서 다시 읽는다."""
+    if refresh or not _identity_index.loaded:
+        _identity_index.load(target_session)
+    return _identity_index
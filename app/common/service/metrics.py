@@ -0,0 +1,161 @@
+import asyncio
+import datetime
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Optional
+
+from config import METRICS_REPORT_PATH, PROGRESS_INTERVAL
+
+# 지연 시간 히스토그램 구간 상한(초). 마지막 구간은 그 이상 전부
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+
+class StageStats:
+    """단계 하나의 호출 수, 처리한 row/파일 수, byte 수, 지연 시간 합계/최대/히스토그램"""
+
+    def __init__(self):
+        self.count = 0
+        self.items = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, seconds: float, items: int, size: int):
+        self.count += 1
+        self.items += items
+        self.bytes += size
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for index, upper in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={upper}s" for upper in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+        return {
+            "count": self.count,
+            "items": self.items,
+            "bytes": self.bytes,
+            "total_seconds": round(self.seconds, 6),
+            "avg_seconds": round(self.seconds / self.count, 6) if self.count else 0,
+            "max_seconds": round(self.max_seconds, 6),
+            "items_per_second": round(self.items / self.seconds, 2) if self.seconds else 0,
+            "latency_histogram": dict(zip(labels, self.buckets)),
+        }
+
+class Timer:
+    """Metrics.timed가 반환하는 측정 구간. 블록 안에서 items/bytes를 채우면 함께 기록된다."""
+
+    def __init__(self, metrics: "Metrics", stage: str, items: int, size: int):
+        self.metrics = metrics
+        self.stage = stage
+        self.items = items
+        self.bytes = size
+        self.started = None
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        if exc_type is None:
+            self.metrics.record(self.stage, seconds, self.items, self.bytes)
+        else:
+            self.metrics.record(f"{self.stage}.error", seconds, self.items, self.bytes)
+
+class Metrics:
+    """
+    실행 전체의 단계별 통계와 entity별 진행 상황
+    DB 작업이 스레드에서 실행되므로 기록은 lock으로 보호한다.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = datetime.datetime.now()
+        self.started = time.perf_counter()
+        self.stages: Dict[str, StageStats] = defaultdict(StageStats)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.rows: Dict[str, int] = defaultdict(int)
+        self.totals: Dict[str, int] = {}
+        # 다른 모듈이 실행 요약에 덧붙이는 항목 (이름 -> dict를 만드는 함수)
+        self.sections: Dict[str, Callable[[], Dict]] = {}
+
+    def timed(self, stage: str, items: int = 0, size: int = 0) -> Timer:
+        return Timer(self, stage, items, size)
+
+    def record(self, stage: str, seconds: float, items: int = 0, size: int = 0):
+        with self.lock:
+            self.stages[stage].record(seconds, items, size)
+
+    def incr(self, counter: str, value: int = 1):
+        with self.lock:
+            self.counters[counter] += value
+
+    def set_total(self, entity: str, total: int):
+        with self.lock:
+            self.totals[entity] = total
+
+    def add_rows(self, entity: str, count: int):
+        with self.lock:
+            self.rows[entity] += count
+
+    def add_section(self, name: str, build: Callable[[], Dict]):
+        """실행 요약에 name 항목을 추가한다. build는 요약을 만들 때마다 호출된다."""
+        self.sections[name] = build
+
+    def progress(self, entity: str, since: float, rows_at_start: int) -> str:
+        with self.lock:
+            rows = self.rows[entity]
+            total = self.totals.get(entity)
+        elapsed = time.perf_counter() - since
+        rate = (rows - rows_at_start) / elapsed if elapsed > 0 else 0
+        if total is None:
+            return f"[{entity}] {rows} rows, {rate:.1f} rows/s"
+        eta = datetime.timedelta(seconds=int((total - rows) / rate)) if rate > 0 else "-"
+        return f"[{entity}] {rows}/{total} rows, {rate:.1f} rows/s, ETA {eta}"
+
+    async def report_progress(self, entity: str, interval: float = PROGRESS_INTERVAL):
+        """interval초마다 entity의 진행 상황(처리 row 수, rows/s, 남은 시간 추정)을 출력한다. 취소될 때까지 실행"""
+        since = time.perf_counter()
+        with self.lock:
+            rows_at_start = self.rows[entity]
+        while True:
+            await asyncio.sleep(interval)
+            print(self.progress(entity, since, rows_at_start))
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            elapsed = time.perf_counter() - self.started
+            report = {
+                "started_at": self.started_at.isoformat(),
+                "elapsed_seconds": round(elapsed, 3),
+                "rows": {
+                    entity: {
+                        "migrated": count,
+                        "total": self.totals.get(entity),
+                        "rows_per_second": round(count / elapsed, 2) if elapsed else 0,
+                    }
+                    for entity, count in self.rows.items()
+                },
+                "counters": dict(self.counters),
+                "stages": {stage: stats.to_dict() for stage, stats in sorted(self.stages.items())},
+            }
+            sections = dict(self.sections)
+        report.update((name, build()) for name, build in sections.items())
+        return report
+
+    def write_report(self, path: Optional[str] = METRICS_REPORT_PATH):
+        """실행 요약을 JSON 파일로 저장한다. path가 None이면 저장하지 않는다."""
+        if not path:
+            return
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+# 프로세스 전체에서 공유하는 실행 통계
+metrics = Metrics()
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, List
+
+from config import PIPELINE_QUEUE_SIZE
+
+_DONE = object()
+
+class StageError(Exception):
+    """파이프라인 단계가 실패한 항목(item)과 원래 예외를 담는다. 메시지는 원래 예외와 같다."""
+
+    def __init__(self, item: Any, cause: Exception):
+        super().__init__(str(cause))
+        self.item = item
+        self.cause = cause
+
+def tolerant(stage: Callable[[dict], Awaitable[dict]]) -> Callable[[dict], Awaitable[dict]]:
+    """
+    실패해도 파이프라인을 멈추지 않는 단계로 감싼다.
+    예외는 item["error"]에 담아 뒤 단계로 넘기고, 앞 단계에서 이미 실패한 item은 실행하지 않고 그대로 넘긴다.
+    """
+    async def run(item):
+        if item.get("error") is None:
+            try:
+                return await stage(item)
+            except Exception as e:
+                item["error"] = e
+        return item
+    return run
+
+async def run_pipeline(
+        source: AsyncIterator,
+        stages: List[Callable[[Any], Awaitable[Any]]],
+        queue_size: int = PIPELINE_QUEUE_SIZE
+    ):
+    """
+    source에서 나온 항목을 stages 순서대로 흘려보낸다.
+    단계마다 하나의 태스크가 크기 queue_size인 큐로 연결되어 동시에 진행되고 (예: 읽기 -> 변환 -> 증빙 전송 -> 쓰기),
+    뒤 단계가 밀리면 큐가 차서 앞 단계가 기다린다.
+    한 단계가 실패하면 그 단계와 앞 단계는 남은 항목을 버리고, 뒤 단계는 이미 넘겨받은 항목까지 처리한 뒤 끝낸다.
+    (진행 중인 DB 쓰기를 중간에 취소하지 않는다) 모든 단계가 끝나면 첫 실패를 StageError로 올린다.
+    """
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    failure = None
+    failed_at = None
+
+    def fail(index, item, e):
+        nonlocal failure, failed_at
+        if failure is None:
+            failure = StageError(item, e)
+            failed_at = index
+
+    async def produce():
+        try:
+            async for item in source:
+                if failure is not None:
+                    break
+                await queues[0].put(item)
+        except Exception as e:
+            fail(-1, None, e)
+        await queues[0].put(_DONE)
+
+    async def consume(index, stage):
+        in_queue = queues[index]
+        out_queue = queues[index + 1] if index + 1 < len(queues) else None
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                break
+            # 이 단계나 뒤 단계가 실패했으면 남은 항목은 처리하지 않고 비운다
+            if failed_at is not None and index <= failed_at:
+                continue
+            try:
+                result = await stage(item)
+            except Exception as e:
+                fail(index, item, e)
+                continue
+            if out_queue is not None:
+                await out_queue.put(result)
+        if out_queue is not None:
+            await out_queue.put(_DONE)
+
+    tasks = [asyncio.create_task(produce())]
+    tasks.extend(asyncio.create_task(consume(index, stage)) for index, stage in enumerate(stages))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if failure is not None:
+        raise failure
@@ -0,0 +1,139 @@
+import contextvars
+import functools
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import ExecuteStyle
+
+from app.common.service.metrics import metrics
+from config import source_engine, target_engine, AsyncSourceSession, AsyncTargetSession
+
+# 부모 row 수 대비 이 비율 이상 실행된 쿼리를 N+1로 본다 (묶음 쿼리는 묶음 크기만큼 비율이 낮다)
+N_PLUS_ONE_RATIO = 0.5
+# 부모 row가 이보다 적으면 판단하지 않는다
+N_PLUS_ONE_MIN_ROWS = 10
+# 실행 요약에 남길 쿼리 종류 수 (실행 횟수 순)
+REPORT_TOP_QUERIES = 20
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_REPEATED_LISTS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """리터럴, IN (...) 목록, multi-row VALUES를 ?로 접어 같은 모양의 쿼리를 하나로 묶는다."""
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _LITERAL.sub("?", sql)
+    sql = _VALUE_LIST.sub("(?)", sql)
+    return _REPEATED_LISTS.sub("(?)", sql)
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+class QueryProfiler:
+    """
+    source/target 엔진에 SQLAlchemy 이벤트 리스너를 붙여 실행된 SQL을 정규화된 모양별로 센다.
+    쿼리는 실행 중인 마이그레이션(scope: activity, funding)별로 모으고, metrics의 처리 row 수로 나눠
+    부모 row당 쿼리 수와 N+1로 의심되는 쿼리(부모 row마다 한 번씩 실행되는 쿼리)를 실행 요약에 남긴다.
+    executemany를 SQLAlchemy가 insertmanyvalues로 나눠 보내는 INSERT는 나뉜 수와 관계없이 한 번으로 센다.
+    (SQLite의 RETURNING 순서 보장 insert처럼 row마다 나뉘어도 애플리케이션은 묶음 하나로 실행했으므로 N+1이 아니다)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.installed = set()
+        self.stats: Dict[str, Dict[str, QueryStats]] = defaultdict(lambda: defaultdict(QueryStats))
+        # run_db의 스레드와 파이프라인 태스크에도 전달되도록 ContextVar로 둔다
+        self.current_scope = contextvars.ContextVar("query_profiler_scope", default="-")
+
+    def install(self, *engines):
+        """엔진에 리스너를 붙인다. engines를 생략하면 config의 source/target 엔진 (비동기 엔진 포함)"""
+        if not engines:
+            engines = [source_engine, target_engine]
+            engines += [factory.kw["bind"].sync_engine for factory in (AsyncSourceSession, AsyncTargetSession) if factory is not None]
+        for engine in engines:
+            if engine in self.installed:
+                continue
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+            event.listen(engine, "handle_error", self._handle_error)
+            self.installed.add(engine)
+        metrics.add_section("queries", self.to_dict)
+
+    def scoped(self, scope: str):
+        """코루틴 함수 안에서 실행된 쿼리를 scope로 모으는 데코레이터"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                token = self.current_scope.set(scope)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.current_scope.reset(token)
+            return wrapper
+        return decorator
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_profiler_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_profiler_started"].pop()
+        count = 1
+        if context is not None and context.execute_style is ExecuteStyle.INSERTMANYVALUES:
+            # 같은 실행의 두 번째 batch부터는 시간만 더한다
+            count = 0 if getattr(context, "query_profiler_counted", False) else 1
+            context.query_profiler_counted = True
+        self.record(self.current_scope.get(), statement, seconds, count)
+
+    def _handle_error(self, exception_context):
+        started = exception_context.connection.info.get("query_profiler_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+    def record(self, scope: str, statement: str, seconds: float, count: int = 1):
+        sql = normalize_sql(statement)
+        with self.lock:
+            stats = self.stats[scope][sql]
+            stats.count += count
+            stats.seconds += seconds
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            snapshot = {scope: dict(queries) for scope, queries in self.stats.items()}
+
+        report = {}
+        for scope, queries in sorted(snapshot.items()):
+            parent_rows = metrics.rows.get(scope, 0)
+            statements = sum(stats.count for stats in queries.values())
+            ranked = sorted(queries.items(), key=lambda item: item[1].count, reverse=True)
+
+            def describe(sql, stats):
+                return {
+                    "sql": sql,
+                    "count": stats.count,
+                    "per_row": round(stats.count / parent_rows, 3) if parent_rows else None,
+                    "total_seconds": round(stats.seconds, 6),
+                }
+
+            report[scope] = {
+                "statements": statements,
+                "parent_rows": parent_rows,
+                "statements_per_row": round(statements / parent_rows, 3) if parent_rows else None,
+                "total_seconds": round(sum(stats.seconds for stats in queries.values()), 6),
+                "top": [describe(sql, stats) for sql, stats in ranked[:REPORT_TOP_QUERIES]],
+                "n_plus_one": [
+                    describe(sql, stats) for sql, stats in ranked
+                    if parent_rows >= N_PLUS_ONE_MIN_ROWS and stats.count >= parent_rows * N_PLUS_ONE_RATIO
+                ],
+            }
+        return report
+
+# 프로세스 전체에서 공유하는 쿼리 프로파일러 (PROFILE_QUERIES 또는 benchmark.py --profile-queries로 켠다)
+query_profiler = QueryProfiler()
@@ -0,0 +1,82 @@
+from sqlalchemy import func, or_, true
+
+from config import SOURCE_PAGE_SIZE, USE_ROW_RECORDS
+from app.common.service.database import run_db
+from app.common.service.metrics import metrics
+
+def load_club_ids(source_session, model, *criteria):
+    """원본 테이블에 실제로 존재하는 (criteria를 만족하는 row가 있는) club_id 목록 (오름차순)"""
+    with metrics.timed("source_query"):
+        query = source_session.query(model.club_id).filter(*criteria).distinct().order_by(model.club_id)
+        return [club_id for (club_id,) in query]
+
+def count_rows(source_session, model, *criteria) -> int:
+    """원본 테이블에서 criteria를 만족하는 row 수 (진행률/남은 시간 계산용)"""
+    with metrics.timed("source_query"):
+        return source_session.query(func.count()).select_from(model).filter(*criteria).scalar()
+
+def load_high_water_mark(source_session, model):
+    """원본 테이블의 recent_edit / recent_feedback 중 가장 늦은 시각 (row가 없으면 None)"""
+    with metrics.timed("source_query"):
+        recent_edit, recent_feedback = source_session.query(func.max(model.recent_edit), func.max(model.recent_feedback)).one()
+    return max((value for value in (recent_edit, recent_feedback) if value is not None), default=None)
+
+def changed_since(model, since, after_id=None):
+    """
+    증분 동기화 대상 조건: since 이후 수정(recent_edit)되거나 피드백(recent_feedback)이 달린 row,
+    또는 after_id(이미 옮긴 가장 큰 원본 id)보다 id가 큰 새 row. since가 None이면 전체
+    워터마크와 같은 시각의 변경도 놓치지 않도록 경계를 포함한다.
+    """
+    if since is None:
+        return true()
+    conditions = [model.recent_edit >= since, model.recent_feedback >= since]
+    if after_id is not None:
+        conditions.append(model.id > after_id)
+    return or_(*conditions)
+
+def load_rows(source_session, model, record_type, *criteria, order_by=None, limit=None):
+    """
+    원본 row를 읽는다.
+    USE_ROW_RECORDS면 record_type.columns만 조회해 record(NamedTuple)로 만들고,
+    아니면 model의 ORM 인스턴스를 그대로 반환한다.
+    """
+    if USE_ROW_RECORDS:
+        query = source_session.query(*record_type.columns)
+    else:
+        query = source_session.query(model)
+
+    query = query.filter(*criteria)
+    if order_by is not None:
+        query = query.order_by(order_by)
+    if limit is not None:
+        query = query.limit(limit)
+
+    with metrics.timed("source_query") as timer:
+        if USE_ROW_RECORDS:
+            rows = [record_type._make(row) for row in query]
+        else:
+            rows = query.all()
+        timer.items = len(rows)
+    return rows
+
+def load_page(source_session, model, record_type, key, after, page_size, criteria):
+    """key > after 인 row를 key 순서로 page_size개까지 읽는다."""
+    if after is not None:
+        criteria = (*criteria, key > after)
+    return load_rows(source_session, model, record_type, *criteria, order_by=key, limit=page_size)
+
+async def iter_pages(source_session, model, record_type, key, *criteria, page_size=SOURCE_PAGE_SIZE):
+    """
+    원본 테이블을 기본 키 기준 keyset 페이지로 나눠 순서대로 반환하는 비동기 제너레이터
+    OFFSET 없이 마지막으로 읽은 key 다음부터 읽으므로 테이블 크기와 관계없이 한 번에 한 페이지만 메모리에 둔다.
+    페이지마다 run_db로 짧은 쿼리를 실행하므로 다른 club과 커넥션/스레드를 오래 점유하지 않는다.
+    """
+    after = None
+    while True:
+        rows = await run_db(source_session, load_page, model, record_type, key, after, page_size, criteria)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        after = getattr(rows[-1], key.key)
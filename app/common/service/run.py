@@ -0,0 +1,85 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, NamedTuple
+
+from app.common.service.checkpoint import CheckpointStore
+from app.common.service.database import open_source_session, open_target_session, run_db, close_session
+from app.common.service.dead_letter import DeadLetterStore
+from app.common.service.evidence import EvidenceTransfer, FileIdCache
+from app.common.service.identity import IdentityIndex, get_identity_index
+from app.common.service.metrics import metrics
+from app.common.service.profiler import query_profiler
+from app.common.service.sync import SyncPlan, plan_sync, finish_sync
+from app.common.service.transformer import TransformPool
+from config import PROFILE_QUERIES, INCREMENTAL_SYNC
+
+class MigrationRun(NamedTuple):
+    """
+    마이그레이션 실행 하나가 club들 사이에서 공유하는 자원
+    - plans: entity -> 이번 실행의 대상 club (SyncPlan)
+    - evidence_transfer: 실행 전체에서 하나의 HTTP 세션을 쓰는 증빙 파일 전송
+    - transform_pool: 실행 전체에서 하나의 프로세스 풀(TRANSFORM_PROCESSES > 0일 때)을 쓰는 변환
+    """
+    checkpoint: CheckpointStore
+    dead_letters: DeadLetterStore
+    identity_index: IdentityIndex
+    plans: Dict[str, SyncPlan]
+    evidence_transfer: EvidenceTransfer
+    transform_pool: TransformPool
+
+@asynccontextmanager
+async def migration_run(
+        models: Dict[str, object],
+        identity_index: IdentityIndex = None,
+        refresh_identity_index: bool = False,
+        checkpoint: CheckpointStore = None,
+        file_cache: FileIdCache = None,
+        incremental: bool = INCREMENTAL_SYNC,
+        dead_letters: DeadLetterStore = None
+    ) -> AsyncIterator[MigrationRun]:
+    """
+    마이그레이션 실행의 준비와 정리 (migrate_activities, migrate_fundings, migrate_all, replay_dead_letters가 공유)
+    models(entity -> 원본 모델)의 entity마다 이번 실행의 대상 club을 정하고 진행률을 출력하며, 정상 종료하면 워터마크를 올린다.
+    끝나면 실패해도 단계별 통계를 실행 요약(JSON)으로 저장한다.
+    """
+    # 원본/타겟 쿼리를 모양별로 세어 실행 요약에 남긴다
+    if PROFILE_QUERIES:
+        query_profiler.install()
+
+    # 진행 기록: 이전 실행에서 완료된 club은 entity별로 건너뛴다
+    if checkpoint is None:
+        checkpoint = CheckpointStore()
+    completed_counts = {entity: len(checkpoint.completed_clubs(entity)) for entity in models}
+    if any(completed_counts.values()) and not incremental:
+        print(f"Resuming migration: {' / '.join(f'{count} {entity}' for entity, count in completed_counts.items())} clubs already completed")
+    if dead_letters is None:
+        dead_letters = DeadLetterStore()
+
+    # 학번 -> student/executive id 인덱스는 실행 시작 시 한 번만 로드
+    if identity_index is None:
+        target_session = open_target_session()
+        identity_index = await run_db(target_session, get_identity_index, refresh_identity_index)
+        await close_session(target_session)
+
+    # 원본에 row가 있는 club 중 이번 실행의 대상 (전체: 미완료 club, 증분: 바뀐 row가 있는 club)
+    plans = {}
+    if models:
+        source_session = open_source_session()
+        for entity, model in models.items():
+            plans[entity] = await plan_sync(source_session, checkpoint, entity, model, incremental)
+            # 진행률/남은 시간 계산용: 이번 실행에서 옮길 row 수
+            metrics.set_total(entity, plans[entity].total)
+        await close_session(source_session)
+
+    progress = [asyncio.create_task(metrics.report_progress(entity)) for entity in plans]
+    try:
+        async with EvidenceTransfer(cache=file_cache) as evidence_transfer:
+            with TransformPool(identity_index) as transform_pool:
+                yield MigrationRun(checkpoint, dead_letters, identity_index, plans, evidence_transfer, transform_pool)
+        for entity, plan in plans.items():
+            finish_sync(checkpoint, entity, plan)
+    finally:
+        # 단계별 통계를 실행 요약(JSON)으로 저장
+        for task in progress:
+            task.cancel()
+        metrics.write_report()
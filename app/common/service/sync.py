@@ -0,0 +1,65 @@
+import datetime
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import true
+
+from app.common.service.checkpoint import CheckpointStore
+from app.common.service.database import run_db
+from app.common.service.reader import load_club_ids, count_rows, load_high_water_mark, changed_since
+from config import WRITE_MODE
+
+class SyncPlan(NamedTuple):
+    """
+    이번 실행에서 처리할 club과 club별 추가 조회 조건
+    - club_deltas: club_id -> None(전체 모드: 이미 옮긴 row는 건너뜀) 또는 조회 조건(증분 모드, WRITE_MODE = "upsert": 옮긴 row는 타겟 row를 upsert)
+    - total: 이번 실행에서 처리할 row 수 추정 (진행률용)
+    - watermark: 대상 club이 모두 끝나면 저장할 새 워터마크 (전체 모드는 None)
+    """
+    club_deltas: Dict[int, Optional[object]]
+    total: int
+    watermark: Optional[datetime.datetime]
+
+async def plan_sync(source_session, checkpoint: CheckpointStore, entity: str, model, incremental: bool, write_mode: str = WRITE_MODE) -> SyncPlan:
+    """
+    entity 마이그레이션의 대상 club을 정한다.
+    전체 모드는 완료되지 않은 club 전체를 대상으로 하고, 처음 백필을 시작할 때의 원본 워터마크를 기록해 둔다.
+    WRITE_MODE가 "upsert"이면 그 club의 이미 옮긴 row도 건너뛰지 않고 다시 쓴다.
+    증분 모드는 워터마크 이후 recent_edit/recent_feedback가 바뀌었거나 새로 생긴 row가 있는 club과,
+    아직 완료되지 않은 club(백필이 중단된 경우 전체 row)을 대상으로 하고, 대상 club을 미완료로 돌려 둔다.
+    """
+    high_water_mark = await run_db(source_session, load_high_water_mark, model)
+    completed_club_ids = checkpoint.completed_clubs(entity)
+    migrated_rows = checkpoint.migrated_rows(entity)
+    club_ids = await run_db(source_session, load_club_ids, model)
+
+    if not incremental:
+        # 백필 시작 시점의 워터마크: 이후 증분 동기화는 그 뒤의 변경만 본다
+        if checkpoint.watermark(entity) is None and high_water_mark is not None:
+            checkpoint.set_watermark(entity, high_water_mark)
+        if write_mode == "upsert":
+            # 이미 완료된 club의 row는 다시 쓰지 않으므로 남은 club의 row만 센다
+            pending_club_ids = [club_id for club_id in club_ids if club_id not in completed_club_ids]
+            total = await run_db(source_session, count_rows, model, model.club_id.in_(pending_club_ids)) if pending_club_ids else 0
+            return SyncPlan({club_id: true() for club_id in pending_club_ids}, total, None)
+        total = await run_db(source_session, count_rows, model) - len(migrated_rows)
+        return SyncPlan({club_id: None for club_id in club_ids if club_id not in completed_club_ids}, total, None)
+
+    since = checkpoint.watermark(entity)
+    delta = changed_since(model, since, max(migrated_rows, default=None))
+    club_deltas = {club_id: true() for club_id in club_ids if club_id not in completed_club_ids}
+    for club_id in await run_db(source_session, load_club_ids, model, delta):
+        club_deltas.setdefault(club_id, delta)
+
+    # 중간에 멈춰도 다음 실행이 이 club들을 다시 보도록 미완료로 돌린다
+    checkpoint.unmark_clubs_completed(entity, club_deltas)
+    total = await run_db(source_session, count_rows, model, delta)
+    print(f"Incremental {entity} sync since {since or 'the beginning'}: {len(club_deltas)} clubs")
+    return SyncPlan(club_deltas, total, high_water_mark)
+
+def finish_sync(checkpoint: CheckpointStore, entity: str, plan: SyncPlan):
+    """증분 동기화 대상 club이 모두 끝났으면 워터마크를 이번 실행 시작 시점으로 올린다."""
+    if plan.watermark is None:
+        return
+    completed_club_ids = checkpoint.completed_clubs(entity)
+    if all(club_id in completed_club_ids for club_id in plan.club_deltas):
+        checkpoint.set_watermark(entity, plan.watermark)
@@ -0,0 +1,54 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+from app.common.service.identity import IdentityIndex
+from config import TRANSFORM_PROCESSES
+
+# 워커 프로세스마다 시작 시 한 번 받아 두는 학번 -> id 인덱스
+_worker_identity_index = None
+
+def _init_worker(identity_index: IdentityIndex):
+    global _worker_identity_index
+    _worker_identity_index = identity_index
+
+def _run_in_worker(fn: Callable, args: tuple):
+    return fn(_worker_identity_index, *args)
+
+class TransformPool:
+    """
+    prefetch가 끝난 묶음의 변환(순수 함수)을 실행한다.
+    processes가 1 이상이면 ProcessPoolExecutor로 묶음을 코어에 나눠 변환해 DB 쓰기와 겹쳐 진행하고,
+    0이면 호출한 곳에서 바로 변환한다.
+    변환 함수는 모듈 최상위 함수여야 하며 (identity_index, *args)를 받아 plain dict/list를 반환해야 한다.
+    identity_index는 워커 시작 시 한 번만 넘기고, 묶음마다는 해당 묶음의 row만 보낸다.
+    """
+
+    def __init__(self, identity_index: IdentityIndex, processes: int = TRANSFORM_PROCESSES):
+        self.identity_index = identity_index
+        self.executor = None
+        if processes > 0:
+            # 이벤트 루프/DB 커넥션을 가진 프로세스를 fork하지 않도록 spawn으로 띄운다
+            self.executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(identity_index,)
+            )
+
+    def __enter__(self) -> "TransformPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def run(self, fn: Callable, *args):
+        if self.executor is None:
+            return fn(self.identity_index, *args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, _run_in_worker, fn, args)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
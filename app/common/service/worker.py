@@ -0,0 +1,41 @@
+import asyncio
+from typing import Awaitable, Callable, Iterable, List
+
+async def run_clubs(
+        club_ids: Iterable[int],
+        migrate_club: Callable[[int], Awaitable[List[str]]],
+        concurrency: int
+    ):
+    """
+    club들을 concurrency개의 워커로 동시에 마이그레이션한다.
+    migrate_club은 club 하나를 처리하고 출력할 로그 목록을 반환하며,
+    로그는 완료 순서와 관계없이 club id 순서대로 출력한다.
+    """
+    club_ids = list(club_ids)
+    queue = asyncio.Queue()
+    for club_id in club_ids:
+        queue.put_nowait(club_id)
+
+    finished = {}
+    next_index = 0
+
+    def flush_logs():
+        nonlocal next_index
+        while next_index < len(club_ids) and club_ids[next_index] in finished:
+            for line in finished.pop(club_ids[next_index]):
+                print(line)
+            next_index += 1
+
+    async def worker():
+        while True:
+            try:
+                club_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                finished[club_id] = await migrate_club(club_id)
+            except Exception as e:
+                finished[club_id] = [f"Error during migration: {e}, clubId: {club_id}"]
+            flush_logs()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
@@ -0,0 +1,17 @@
+from collections import defaultdict
+
+def chunked(values, size):
+    """리스트를 size 개씩 잘라서 순서대로 반환"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def group_by(rows, key):
+    """row들을 key 속성 값 기준으로 묶은 dict 반환"""
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[getattr(row, key)].append(row)
+    return grouped
+
+def subset(mapping, keys):
+    """mapping에서 keys에 해당하는 항목만 남긴 dict 반환"""
+    return {key: mapping[key] for key in keys if key in mapping}
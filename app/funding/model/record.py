@@ -0,0 +1,119 @@
+import datetime
+from typing import NamedTuple, Optional, Union
+
+from app.funding.model.source import (
+    Funding as SourceFunding,
+    FundingEvidence as SourceFundingEvidence,
+    FundingFeedback as SourceFundingFeedback,
+    FundingFixture as SourceFundingFixture,
+    FundingTransportationMember as SourceFundingTransportationMember,
+)
+
+# 원본 테이블에서 변환에 쓰는 컬럼만 읽어 담는 가벼운 row 타입
+# 필드 이름은 ORM 모델 속성과 같아서 변환 함수는 ORM 인스턴스와 record를 구분 없이 받는다.
+
+class FundingRecord(NamedTuple):
+    id: int
+    name: str
+    club_id: int
+    expenditure_date: Optional[datetime.date]
+    expenditure_amount: Optional[int]
+    approved_amount: Optional[int]
+    purpose: Optional[str]
+    is_transportation: Optional[bool]
+    is_non_corporate_transaction: Optional[bool]
+    is_food_expense: Optional[bool]
+    is_labor_contract: Optional[bool]
+    is_external_event_participation_fee: Optional[bool]
+    is_publication: Optional[bool]
+    is_profit_making_activity: Optional[bool]
+    is_joint_expense: Optional[bool]
+    additional_explanation: Optional[str]
+    funding_feedback_type: Optional[int]
+    recent_edit: Optional[datetime.datetime]
+    recent_feedback: Optional[datetime.datetime]
+
+    columns = (
+        SourceFunding.id,
+        SourceFunding.name,
+        SourceFunding.club_id,
+        SourceFunding.expenditure_date,
+        SourceFunding.expenditure_amount,
+        SourceFunding.approved_amount,
+        SourceFunding.purpose,
+        SourceFunding.is_transportation,
+        SourceFunding.is_non_corporate_transaction,
+        SourceFunding.is_food_expense,
+        SourceFunding.is_labor_contract,
+        SourceFunding.is_external_event_participation_fee,
+        SourceFunding.is_publication,
+        SourceFunding.is_profit_making_activity,
+        SourceFunding.is_joint_expense,
+        SourceFunding.additional_explanation,
+        SourceFunding.funding_feedback_type,
+        SourceFunding.recent_edit,
+        SourceFunding.recent_feedback,
+    )
+
+class FundingFixtureRecord(NamedTuple):
+    id: int
+    funding_id: int
+    funding_fixture_type_id: Optional[int]
+    fixture_name: Optional[str]
+    fixture_type_id: Optional[int]
+    usage_purpose: Optional[str]
+    is_software: Optional[bool]
+    software_proof_text: Optional[str]
+
+    columns = (
+        SourceFundingFixture.id,
+        SourceFundingFixture.funding_id,
+        SourceFundingFixture.funding_fixture_type_id,
+        SourceFundingFixture.fixture_name,
+        SourceFundingFixture.fixture_type_id,
+        SourceFundingFixture.usage_purpose,
+        SourceFundingFixture.is_software,
+        SourceFundingFixture.software_proof_text,
+    )
+
+class FundingEvidenceRecord(NamedTuple):
+    id: int
+    funding_id: int
+    funding_evidence_type_id: Optional[int]
+    image_url: str
+    description: str
+
+    columns = (
+        SourceFundingEvidence.id,
+        SourceFundingEvidence.funding_id,
+        SourceFundingEvidence.funding_evidence_type_id,
+        SourceFundingEvidence.image_url,
+        SourceFundingEvidence.description,
+    )
+
+class FundingTransportationMemberRecord(NamedTuple):
+    funding_id: int
+    student_id: int
+
+    columns = (SourceFundingTransportationMember.funding_id, SourceFundingTransportationMember.student_id)
+
+class FundingFeedbackRecord(NamedTuple):
+    id: int
+    funding: int
+    student_id: int
+    added_time: datetime.datetime
+    feedback: str
+
+    columns = (
+        SourceFundingFeedback.id,
+        SourceFundingFeedback.funding,
+        SourceFundingFeedback.student_id,
+        SourceFundingFeedback.added_time,
+        SourceFundingFeedback.feedback,
+    )
+
+FundingRow = Union[SourceFunding, FundingRecord]
+FundingFixtureRow = Union[SourceFundingFixture, FundingFixtureRecord]
+FundingEvidenceRow = Union[SourceFundingEvidence, FundingEvidenceRecord]
+FundingTransportationMemberRow = Union[SourceFundingTransportationMember, FundingTransportationMemberRecord]
+FundingFeedbackRow = Union[SourceFundingFeedback, FundingFeedbackRecord]
@@ -1,4 +1,6 @@
-from datetime import datetime
+import asyncio
+from collections import defaultdict
+from app.activity.model.source import Activity as SourceActivity
 from app.funding.model.source import (
     Funding as SourceFunding,
     FundingEvidence as SourceFundingEvidence,
@@ -16,146 +18,275 @@ from app.funding.model.target import (
     FundingClubSuppliesImageFile as TargetFundingClubSuppliesImageFile,
     FundingClubSuppliesSoftwareEvidenceFile as TargetFundingClubSuppliesSoftwareEvidenceFile,
     FundingTransportationPassenger as TargetFundingTransportationPassenger,
-    FundingFeedback as TargetFundingFeedback,
-    Student as TargetStudent,
-    Executive as TargetExecutive
+    FundingFeedback as TargetFundingFeedback
 )
-from app.activity.model.source import Activity as SourceActivity
-from app.activity.model.target import Activity as TargetActivity
-from config import SourceSession, TargetSession
+from app.funding.model.record import (
+    FundingRecord,
+    FundingEvidenceRecord,
+    FundingFeedbackRecord,
+    FundingFixtureRecord,
+    FundingTransportationMemberRecord
+)
+from app.common.service.database import open_source_session, open_target_session, run_db, close_session, ChunkedCommitter
+from app.common.service.dead_letter import DeadLetterStore
+from app.common.service.metrics import metrics
+from app.common.service.profiler import query_profiler
+from app.common.service.pipeline import run_pipeline, tolerant, StageError
+from app.common.service.run import migration_run
+from app.common.service.reader import load_rows, iter_pages
+from app.common.service.transformer import TransformPool
+from app.common.service.worker import run_clubs
+from app.common.service.writer import insert_or_update_ids, write_children, assign_parent_ids, in_savepoint
+from app.common.util import chunked, group_by, subset
+from config import PREFETCH_CHUNK_SIZE, INSERT_BATCH_SIZE, CLUB_CONCURRENCY, INCREMENTAL_SYNC
 from app.funding.service.transformation import (
-    transform_funding,
+    transform_funding_rows,
     transform_funding_evidence_files,
-    transform_funding_transportation_passengers,
-    transform_funding_feedbacks,
 )
 
-async def migrate_fundings():
-    source_session = SourceSession()
-    target_session = TargetSession()
-
-    # 원본 데이터 로드
-    for i in range(1, 88):  # activity와 동일한 club_id 범위
-        print(f"Migrating funding for club {i}...")
-        source_fundings = source_session.query(SourceFunding).order_by(SourceFunding.id).filter(SourceFunding.club_id == i).all()
-        
-        if len(source_fundings) == 0:
-            continue
-    
+# 증빙 파일 테이블 이름 -> 타겟 모델
+funding_file_models = {
+    "funding_trade_evidence_file": TargetFundingTradeEvidenceFile,
+    "funding_trade_detail_file": TargetFundingTradeDetailFile,
+    "funding_etc_expense_file": TargetFundingEtcExpenseFile,
+    "funding_fixture_image_file": TargetFundingFixtureImageFile,
+    "funding_fixture_software_evidence_file": TargetFundingFixtureSoftwareEvidenceFile,
+    "funding_club_supplies_image_file": TargetFundingClubSuppliesImageFile,
+    "funding_club_supplies_software_evidence_file": TargetFundingClubSuppliesSoftwareEvidenceFile,
+}
+
+@query_profiler.scoped("funding")
+async def migrate_fundings(identity_index=None, refresh_identity_index=False, concurrency=CLUB_CONCURRENCY, checkpoint=None, file_cache=None, incremental=INCREMENTAL_SYNC, dead_letters=None):
+    """
+    funding 마이그레이션
+    incremental이면 워터마크 이후 바뀐 row만 옮기고, 이미 옮긴 row는 id 매핑으로 찾은 타겟 row를 갱신한다.
+    """
+    async with migration_run({"funding": SourceFunding}, identity_index, refresh_identity_index, checkpoint, file_cache, incremental, dead_letters) as run:
+        # 원본 activity id -> 타겟 activity id (activity 마이그레이션이 기록한 매핑)
+        activity_id_map = run.checkpoint.migrated_rows("activity")
+        if not activity_id_map:
+            print("No activity id mapping found in checkpoint. Fundings with a purpose activity will be written to the dead letter store; run migrate_activities first.")
+
+        plan = run.plans["funding"]
+
+        async def migrate_club(club_id):
+            return await migrate_club_fundings(club_id, run.identity_index, activity_id_map, run.evidence_transfer, run.checkpoint, run.transform_pool, plan.club_deltas[club_id], run.dead_letters)
+
+        # 원본 데이터 로드 및 클럽 단위 동시 마이그레이션
+        await run_clubs(sorted(plan.club_deltas), migrate_club, concurrency)
+
+@query_profiler.scoped("funding")
+async def migrate_club_fundings(club_id, identity_index, activity_id_map, evidence_transfer, checkpoint, transform_pool=None, delta=None, dead_letters=None):
+    """
+    club 하나의 funding을 마이그레이션하고 출력할 로그를 반환
+    club마다 별도의 source/target 세션을 쓰고, DB 작업은 run_db로 실행해 다른 club과 겹쳐 진행한다.
+    club 안에서는 읽기 -> 변환 -> 증빙 전송 -> 쓰기를 묶음 단위 파이프라인으로 겹쳐 진행한다.
+    COMMIT_BATCH_ROWS개 또는 COMMIT_INTERVAL초마다 커밋하고 커밋된 row는 checkpoint에 기록하며, 오류 없이 끝난 club만 완료로 표시한다.
+    묶음이 실패하면 funding을 하나씩 다시 처리해 실패한 funding만 savepoint로 되돌리고 dead_letters에 남긴다.
+    delta(증분 동기화 조건)가 있으면 조건에 맞는 row만 읽고, 이미 옮긴 row는 건너뛰지 않고 타겟 row를 갱신한다.
+    """
+    logs = [f"Migrating funding for club {club_id}..."]
+    source_session = open_source_session()
+    target_session = open_target_session()
+    if transform_pool is None:
+        transform_pool = TransformPool(identity_index, processes=0)
+    if dead_letters is None:
+        dead_letters = DeadLetterStore()
+
+    try:
+        # 이전 실행에서 이미 커밋된 funding (전체 모드는 제외, 증분 모드는 갱신)
+        migrated_funding_ids = checkpoint.migrated_rows("funding", club_id)
+        criteria = [SourceFunding.club_id == club_id] if delta is None else [SourceFunding.club_id == club_id, delta]
+        existing_ids = {} if delta is None else migrated_funding_ids
+
+        def on_commit(pairs):
+            checkpoint.record_rows("funding", club_id, pairs)
+            dead_letters.resolve("funding", [source_id for source_id, _ in pairs])
+
+        committer = ChunkedCommitter(target_session, on_commit)
+        failed = False
+        failed_rows = 0
+
+        async def read_batches():
+            # 원본 funding을 id 순서로 한 페이지씩 읽고, 페이지 단위로 하위 데이터를 일괄 로드
+            async for source_fundings in iter_pages(source_session, SourceFunding, FundingRecord, SourceFunding.id, *criteria):
+                if delta is None:
+                    source_fundings = [source_funding for source_funding in source_fundings if source_funding.id not in migrated_funding_ids]
+                if len(source_fundings) == 0:
+                    continue
+
+                prefetched = await run_db(source_session, prefetch_funding_children, source_fundings)
+                prefetched["target_activity_ids"] = activity_id_map
+                for source_funding_batch in chunked(source_fundings, INSERT_BATCH_SIZE):
+                    yield {"source_fundings": source_funding_batch, "prefetched": prefetched}
+
+        async def transform(batch):
+            batch["transformed"] = await transform_fundings(batch["source_fundings"], batch["prefetched"], transform_pool)
+            return batch
+
+        async def transfer(batch):
+            batch["evidence_files"] = await transfer_funding_evidences(batch["source_fundings"], batch["transformed"], batch["prefetched"], evidence_transfer)
+            return batch
+
+        async def write(batch):
+            nonlocal failed_rows
+            if batch.get("error") is None:
+                try:
+                    pairs = await committer.write(in_savepoint, write_funding_batch, batch["source_fundings"], batch["transformed"], batch["evidence_files"], existing_ids)
+                except Exception as e:
+                    # 커밋 실패는 묶음이 아니라 club 전체의 실패
+                    if committer.error is not None:
+                        raise
+                    batch["error"] = e
+            if batch.get("error") is not None:
+                pairs = await migrate_fundings_one_by_one(committer, club_id, batch, existing_ids, evidence_transfer, transform_pool, dead_letters)
+                failed_rows += len(batch["source_fundings"]) - len(pairs)
+            metrics.add_rows("funding", len(pairs))
+
         try:
-            for source_funding in source_fundings:
-                # 변환 로직 실행
-                await migrate_funding(target_session, source_session, source_funding)
+            await run_pipeline(read_batches(), [tolerant(transform), tolerant(transfer), write])
         except Exception as e:
-            print(f"Error during funding migration: {e}, clubId: {i}, fundingId: {source_funding.id}")
-        
-        # 커밋
-        target_session.commit()
-        print(f"Funding migration completed successfully. clubId: {i}")
-
-    source_session.close()
-    target_session.close()
-
-async def migrate_funding(target_session, source_session, source_funding):
-    # 관련된 activity id 찾기
-    source_activity = source_session.query(SourceActivity).filter(
-        SourceActivity.id == source_funding.purpose
-    ).first()
-    
-    if source_activity:
-        activity_d_id = 7 if source_activity.recent_edit < datetime(2024, 3, 1) else 2
-        target_activity = target_session.query(TargetActivity).filter(
-            TargetActivity.club_id == source_activity.club_id,
-            TargetActivity.name == source_activity.title,
-            TargetActivity.activity_d_id == activity_d_id
-        ).first()
-        target_activity_id = target_activity.id if target_activity else None
-    else:
-        target_activity_id = None
-
-    funding_fixture = source_session.query(SourceFundingFixture).filter(
-        SourceFundingFixture.funding_id == source_funding.id
-    ).first()
-
-    # 기본 funding 데이터 변환
-    transformed_funding = transform_funding(source_funding, target_activity_id, funding_fixture)
-    target_funding = TargetFunding(**transformed_funding)
-    target_session.add(target_funding)
-    target_session.flush()
-    target_session.refresh(target_funding)
-    target_funding_id = target_funding.id
-
-    # funding evidence 파일 변환
-    source_funding_evidences = source_session.query(SourceFundingEvidence).filter(
-        SourceFundingEvidence.funding_id == source_funding.id
-    ).all()
-    
-    if source_funding_evidences:
-        transformed_files = await transform_funding_evidence_files(
-            source_funding,
-            target_funding,
-            source_funding_evidences,
-            target_funding_id
-        )
-        
-        for file_info in transformed_files:
-            table_name = file_info.pop('table_name')
-            if table_name == "funding_trade_evidence_file":
-                target_file = TargetFundingTradeEvidenceFile(**file_info)
-            elif table_name == "funding_trade_detail_file":
-                target_file = TargetFundingTradeDetailFile(**file_info)
-            elif table_name == "funding_etc_expense_file":
-                target_file = TargetFundingEtcExpenseFile(**file_info)
-            elif table_name == "funding_fixture_image_file":
-                target_file = TargetFundingFixtureImageFile(**file_info)
-            elif table_name == "funding_fixture_software_evidence_file":
-                target_file = TargetFundingFixtureSoftwareEvidenceFile(**file_info)
-            elif table_name == "funding_club_supplies_image_file":
-                target_file = TargetFundingClubSuppliesImageFile(**file_info)
-            elif table_name == "funding_club_supplies_software_evidence_file":
-                target_file = TargetFundingClubSuppliesSoftwareEvidenceFile(**file_info)
-            
-            target_session.add(target_file)
-
-    # transportation passenger 변환
-    source_transportation_members = source_session.query(SourceFundingTransportationMember).filter(
-        SourceFundingTransportationMember.funding_id == source_funding.id
-    ).all()
-    
-    if source_transportation_members:
-        source_member_ids = [member.student_id for member in source_transportation_members]
-        target_students = target_session.query(TargetStudent).filter(
-            TargetStudent.number.in_(source_member_ids)
-        ).all()
-        
-        transformed_passengers = transform_funding_transportation_passengers(
-            source_funding,
-            target_students,
-            target_funding_id
+            failed = True
+            source_funding_batch = e.item["source_fundings"] if isinstance(e, StageError) and e.item else []
+            funding_range = f"{source_funding_batch[0].id}~{source_funding_batch[-1].id}" if source_funding_batch else "-"
+            logs.append(f"Error during funding migration: {e}, clubId: {club_id}, fundingId: {funding_range}")
+
+        # 남은 row 커밋 후 진행 기록 (커밋이 이미 실패했으면 남은 row는 버려졌다)
+        if committer.error is None:
+            await committer.flush()
+        if failed_rows:
+            failed = True
+            logs.append(f"{failed_rows} fundings written to dead letter store {dead_letters.path}, clubId: {club_id}")
+        if not failed:
+            checkpoint.mark_club_completed("funding", club_id)
+            if committer.committed:
+                logs.append(f"Funding migration completed successfully. clubId: {club_id}")
+        elif committer.committed:
+            # 커밋된 row는 체크포인트에 남아 다음 실행에서 나머지만 다시 옮긴다
+            logs.append(f"Funding migration partially completed: {committer.committed} fundings committed. clubId: {club_id}")
+        return logs
+    finally:
+        await close_session(source_session)
+        await close_session(target_session)
+
+def _purpose_activity_id(source_funding):
+    # Funding.purpose에는 activity id가 문자열로 저장되어 있다
+    purpose = (source_funding.purpose or "").strip()
+    return int(purpose) if purpose.isdigit() else None
+
+def prefetch_funding_children(source_session, source_fundings):
+    """
+    funding들(클럽의 한 페이지)에 딸린 하위 데이터를 테이블당 한 번의 IN 쿼리로 불러와 funding id별로 묶는다.
+    purpose가 가리키는 원본 activity 중 실제로 있는 id도 함께 불러온다.
+    """
+    funding_ids = [source_funding.id for source_funding in source_fundings]
+    purpose_ids = sorted({_purpose_activity_id(source_funding) for source_funding in source_fundings} - {None})
+
+    fixtures, evidences, transportation_members, feedbacks = [], [], [], []
+    for ids in chunked(funding_ids, PREFETCH_CHUNK_SIZE):
+        fixtures.extend(load_rows(source_session, SourceFundingFixture, FundingFixtureRecord, SourceFundingFixture.funding_id.in_(ids), order_by=SourceFundingFixture.id))
+        evidences.extend(load_rows(source_session, SourceFundingEvidence, FundingEvidenceRecord, SourceFundingEvidence.funding_id.in_(ids), order_by=SourceFundingEvidence.id))
+        transportation_members.extend(load_rows(source_session, SourceFundingTransportationMember, FundingTransportationMemberRecord, SourceFundingTransportationMember.funding_id.in_(ids)))
+        feedbacks.extend(load_rows(source_session, SourceFundingFeedback, FundingFeedbackRecord, SourceFundingFeedback.funding.in_(ids), order_by=SourceFundingFeedback.id))
+
+    purpose_activity_ids = set()
+    for ids in chunked(purpose_ids, PREFETCH_CHUNK_SIZE):
+        with metrics.timed("source_query"):
+            purpose_activity_ids.update(activity_id for (activity_id,) in source_session.query(SourceActivity.id).filter(SourceActivity.id.in_(ids)))
+
+    return {
+        "fixtures": {funding_id: rows[0] for funding_id, rows in group_by(fixtures, "funding_id").items()},
+        "evidences": group_by(evidences, "funding_id"),
+        "transportation_members": group_by(transportation_members, "funding_id"),
+        "feedbacks": group_by(feedbacks, "funding"),
+        "purpose_activity_ids": purpose_activity_ids,
+    }
+
+async def migrate_fundings_one_by_one(committer, club_id, batch, existing_ids, evidence_transfer, transform_pool, dead_letters):
+    """
+    묶음 처리에 실패한 funding을 하나씩 다시 변환/전송하고 각각 savepoint 안에서 쓴다.
+    그래도 실패한 funding은 savepoint까지만 되돌리고 dead_letters에 남긴다. 증빙 전송에 실패했으면 올리지 못한 URL도 함께 남긴다.
+    성공한 (원본 id, 타겟 id) 목록을 반환한다.
+    """
+    pairs = []
+    for source_funding in batch["source_fundings"]:
+        stage = "transform"
+        try:
+            transformed = await transform_fundings([source_funding], batch["prefetched"], transform_pool)
+            stage = "transfer"
+            evidence_files = await transfer_funding_evidences([source_funding], transformed, batch["prefetched"], evidence_transfer)
+            stage = "write"
+            pairs += await committer.write(in_savepoint, write_funding_batch, [source_funding], transformed, evidence_files, existing_ids)
+        except Exception as e:
+            if committer.error is not None:
+                raise
+            # 올리지 못한 URL = 파일 캐시에 fileId가 없는 URL
+            evidence_urls = [] if stage != "transfer" else [
+                evidence.image_url for evidence in batch["prefetched"]["evidences"].get(source_funding.id, [])
+                if evidence_transfer.cache.get_by_url(evidence.image_url) is None
+            ]
+            dead_letters.record("funding", club_id, source_funding.id, stage, e, evidence_urls)
+    return pairs
+
+async def transform_fundings(source_fundings, prefetched, transform_pool):
+    # 원본 funding id -> purpose 타겟 activity id 맵을 먼저 만들고, 변환에는 이 묶음의 하위 row만 넘긴다
+    # purpose activity가 원본에 있는데 아직 옮겨지지 않았으면 NULL로 쓰지 않고 실패시켜 dead letter로 남긴다 (activity가 옮겨진 뒤 replay에서 연결)
+    activity_id_map = prefetched["target_activity_ids"]
+    purpose_activity_ids = {}
+    for source_funding in source_fundings:
+        purpose_activity_id = _purpose_activity_id(source_funding)
+        if purpose_activity_id in prefetched["purpose_activity_ids"] and purpose_activity_id not in activity_id_map:
+            raise Exception(f"Purpose activity {purpose_activity_id} of funding {source_funding.id} has not been migrated")
+        purpose_activity_ids[source_funding.id] = activity_id_map.get(purpose_activity_id)
+    funding_ids = [source_funding.id for source_funding in source_fundings]
+    with metrics.timed("transform", items=len(source_fundings)):
+        return await transform_pool.run(
+            transform_funding_rows,
+            source_fundings,
+            purpose_activity_ids,
+            subset(prefetched["fixtures"], funding_ids),
+            subset(prefetched["transportation_members"], funding_ids),
+            subset(prefetched["feedbacks"], funding_ids)
         )
-        
-        for transformed_passenger in transformed_passengers:
-            target_passenger = TargetFundingTransportationPassenger(**transformed_passenger)
-            target_session.add(target_passenger)
-
-    # funding feedback 변환
-    source_funding_feedbacks = source_session.query(SourceFundingFeedback).filter(
-        SourceFundingFeedback.funding == source_funding.id
-    ).all()
-
-    if source_funding_feedbacks:
-        source_feedback_student_ids = [feedback.student_id for feedback in source_funding_feedbacks]
-        target_executives = target_session.query(TargetExecutive).join(TargetExecutive.student).filter(
-            TargetStudent.number.in_(source_feedback_student_ids)
-        ).all()
-        
-        transformed_feedbacks = transform_funding_feedbacks(
+
+async def transfer_funding_evidences(source_fundings, transformed, prefetched, evidence_transfer):
+    # funding evidence 파일 변환 (funding들의 전송을 동시에 진행하고, 하나라도 실패하면 이 묶음은 funding 하나씩 다시 처리한다)
+    return await asyncio.gather(*(
+        transform_funding_evidence_files(
             source_funding,
-            source_funding_feedbacks,
-            target_executives,
-            target_funding_id
+            transformed_funding,
+            prefetched["evidences"].get(source_funding.id, []),
+            evidence_transfer
         )
-        
-        for transformed_feedback in transformed_feedbacks:
-            target_feedback = TargetFundingFeedback(**transformed_feedback)
-            target_session.add(target_feedback)
+        for source_funding, transformed_funding in zip(source_fundings, transformed["fundings"])
+    ))
+
+def write_funding_batch(target_session, source_fundings, transformed, evidence_files_per_funding, existing_ids=None):
+    """
+    변환된 funding 묶음을 쓴다. existing_ids(원본 id -> 타겟 id)에 있는 funding은 그 id로 타겟 row를 upsert하고
+    하위 row(증빙 파일, passenger, feedback)도 기존 id를 다시 써서 upsert하므로 같은 묶음을 다시 써도 row가 늘지 않는다.
+    """
+    existing_ids = existing_ids or {}
+    source_funding_ids = [source_funding.id for source_funding in source_fundings]
+    target_funding_ids = insert_or_update_ids(target_session, TargetFunding, source_funding_ids, transformed["fundings"], existing_ids)
+
+    updated_funding_ids = [existing_ids[source_funding_id] for source_funding_id in source_funding_ids if source_funding_id in existing_ids]
+
+    transformed_files = defaultdict(list)
+    for target_funding_id, evidence_files in zip(target_funding_ids, evidence_files_per_funding):
+        for file_info in evidence_files:
+            table_name = file_info.pop('table_name')
+            transformed_files[table_name].append({**file_info, "funding_id": target_funding_id})
+
+    # 변환 시 묶음 내 위치로 넣어 둔 funding_id를 실제 id로 바꾼다
+    transformed_passengers = assign_parent_ids(transformed["passengers"], "funding_id", target_funding_ids)
+    transformed_feedbacks = assign_parent_ids(transformed["feedbacks"], "funding_id", target_funding_ids)
+
+    # 갱신한 funding은 이번에 파일이 없는 테이블의 기존 row도 정리해야 하므로 모든 증빙 파일 테이블을 확인한다
+    for table_name, file_model in funding_file_models.items():
+        if table_name in transformed_files or updated_funding_ids:
+            write_children(target_session, file_model, "funding_id", transformed_files.get(table_name, []), updated_funding_ids)
+    write_children(target_session, TargetFundingTransportationPassenger, "funding_id", transformed_passengers, updated_funding_ids)
+    write_children(target_session, TargetFundingFeedback, "funding_id", transformed_feedbacks, updated_funding_ids)
+
+    return [(source_funding.id, target_funding_id) for source_funding, target_funding_id in zip(source_fundings, target_funding_ids)]
@@ -1,19 +1,15 @@
 import datetime
-import os
-import shutil
-import aiohttp
-import aiofiles
-import asyncio
 from typing import List, Dict
 
-from app.funding.model.source import (
-    Funding as SourceFunding,
-    FundingEvidence as SourceFundingEvidence,
-    FundingFeedback as SourceFundingFeedback,
-    FundingFixture as SourceFundingFixture
+from app.funding.model.record import (
+    FundingRow,
+    FundingEvidenceRow,
+    FundingFeedbackRow,
+    FundingFixtureRow,
+    FundingTransportationMemberRow
 )
-from app.funding.model.target import Student as TargetStudent, Executive as TargetExecutive, Funding as TargetFunding
-from config import API_ACCESS_TOKEN, API_BASE_URL
+from app.common.service.evidence import EvidenceTransfer
+from app.common.service.identity import IdentityIndex
 
 # 상태 매핑
 funding_status_mapping = {
@@ -45,40 +41,92 @@ transportation_type_mapping = {
     10: 10 # 기타
 }
 
-def transform_funding(source_funding: SourceFunding, target_activity_id: int = None, funding_fixture: SourceFundingFixture = None) -> Dict:
-    activity_d_id = 7 if source_funding.recent_edit < datetime.datetime(2024, 3, 1) else 2
-    
-    # 기본 데이터 변환
-    transformed_data = {
-        "club_id": source_funding.club_id,
-        "activity_d_id": activity_d_id,
-        "funding_status_enum": funding_status_mapping.get(source_funding.funding_feedback_type, 1),
-        "purpose_activity_id": target_activity_id,
-        "name": source_funding.name,
-        "expenditure_date": source_funding.expenditure_date,
-        "expenditure_amount": source_funding.expenditure_amount,
-        "approved_amount": source_funding.approved_amount or 0,
-        "trade_detail_explanation": source_funding.additional_explanation or "",
-        "is_transportation": source_funding.is_transportation,
-        "is_non_corporate_transaction": source_funding.is_non_corporate_transaction,
-        "is_food_expense": source_funding.is_food_expense,
-        "is_labor_contract": source_funding.is_labor_contract,
-        "is_external_event_participation_fee": source_funding.is_external_event_participation_fee,
-        "is_publication": source_funding.is_publication,
-        "is_profit_making_activity": source_funding.is_profit_making_activity,
-        "is_joint_expense": source_funding.is_joint_expense,
-        "is_etc_expense": False,
-        "number_of_club_supplies": 0,
-        "price_of_club_supplies": 0,
-        "number_of_fixture": 0,
-        "price_of_fixture": 0,
-        "created_at": source_funding.recent_edit,
-        "edited_at": source_funding.recent_edit,
-        "commented_at": source_funding.recent_feedback,
+# recent_edit이 이 시각 이전이면 activity_d_id를 7로 설정
+ACTIVITY_D_CUTOFF = datetime.datetime(2024, 3, 1)
+
+def transform_funding(source_funding: FundingRow, target_activity_id: int = None, funding_fixture: FundingFixtureRow = None) -> Dict:
+    return transform_funding_batch(
+        [source_funding],
+        {source_funding.id: target_activity_id},
+        {source_funding.id: funding_fixture} if funding_fixture else {}
+    )[0]
+
+def transform_funding_batch(
+        source_fundings: List[FundingRow],
+        target_activity_ids: Dict[int, int],
+        funding_fixtures: Dict[int, FundingFixtureRow]
+    ) -> List[Dict]:
+    """
+    funding 묶음을 한 번의 루프로 변환해 executemany 파라미터 목록으로 반환
+    target_activity_ids: 원본 funding id -> purpose 타겟 activity id
+    funding_fixtures: 원본 funding id -> FundingFixture (없으면 빠짐)
+    """
+    transformed_fundings = []
+    for source_funding in source_fundings:
+        recent_edit = source_funding.recent_edit
+        activity_d_id = 7 if recent_edit < ACTIVITY_D_CUTOFF else 2
+
+        # 기본 데이터 변환
+        transformed_data = {
+            "club_id": source_funding.club_id,
+            "activity_d_id": activity_d_id,
+            "funding_status_enum": funding_status_mapping.get(source_funding.funding_feedback_type, 1),
+            "purpose_activity_id": target_activity_ids.get(source_funding.id),
+            "name": source_funding.name,
+            "expenditure_date": source_funding.expenditure_date,
+            "expenditure_amount": source_funding.expenditure_amount,
+            "approved_amount": source_funding.approved_amount or 0,
+            "trade_detail_explanation": source_funding.additional_explanation or "",
+            "is_transportation": source_funding.is_transportation,
+            "is_non_corporate_transaction": source_funding.is_non_corporate_transaction,
+            "is_food_expense": source_funding.is_food_expense,
+            "is_labor_contract": source_funding.is_labor_contract,
+            "is_external_event_participation_fee": source_funding.is_external_event_participation_fee,
+            "is_publication": source_funding.is_publication,
+            "is_profit_making_activity": source_funding.is_profit_making_activity,
+            "is_joint_expense": source_funding.is_joint_expense,
+            "is_etc_expense": False,
+            "number_of_club_supplies": 0,
+            "price_of_club_supplies": 0,
+            "number_of_fixture": 0,
+            "price_of_fixture": 0,
+            "created_at": recent_edit,
+            "edited_at": recent_edit,
+            "commented_at": source_funding.recent_feedback,
+        }
+
+        funding_fixture = funding_fixtures.get(source_funding.id)
+        if funding_fixture:
+            transformed_data.update(transform_funding_fixture(funding_fixture))
+
+        transformed_fundings.append(transformed_data)
+    return transformed_fundings
+
+def transform_funding_rows(
+        identity_index: IdentityIndex,
+        source_fundings: List[FundingRow],
+        target_activity_ids: Dict[int, int],
+        funding_fixtures: Dict[int, FundingFixtureRow],
+        source_transportation_members: Dict[int, List[FundingTransportationMemberRow]],
+        source_funding_feedbacks: Dict[int, List[FundingFeedbackRow]]
+    ) -> Dict[str, List[Dict]]:
+    """
+    funding 묶음과 하위 row를 한 번에 변환 (TransformPool에서 실행)
+    타겟 funding id는 insert 후에 정해지므로 하위 row의 funding_id에는 묶음 안에서의 위치를 넣는다.
+    """
+    positions = range(len(source_fundings))
+    return {
+        "fundings": transform_funding_batch(source_fundings, target_activity_ids, funding_fixtures),
+        "passengers": transform_funding_transportation_passengers_batch(source_fundings, source_transportation_members, identity_index, positions),
+        "feedbacks": transform_funding_feedbacks_batch(source_fundings, source_funding_feedbacks, identity_index, positions),
     }
-    
+
+def transform_funding_fixture(funding_fixture: FundingFixtureRow) -> Dict:
+    """FundingFixture를 funding의 물품/비품 컬럼으로 변환"""
+    transformed_data = {}
+
     # 비품/물품 데이터 처리
-    if funding_fixture and funding_fixture.funding_fixture_type_id in [1, 2]:  # 비품 구매 또는 비품 관리
+    if funding_fixture.funding_fixture_type_id in [1, 2]:  # 비품 구매 또는 비품 관리
         # 비품인 경우 - 물품과 비품 모두에 데이터 설정
         if funding_fixture.is_software == 1:
             transformed_data.update({
@@ -106,7 +154,7 @@ def transform_funding(source_funding: SourceFunding, target_activity_id: int = N
                 "fixture_class_enum": fixture_class_mapping.get(funding_fixture.fixture_type_id, 5),
                 "fixture_purpose": funding_fixture.usage_purpose
             })
-    elif funding_fixture and funding_fixture.funding_fixture_type_id in [3, 4]:  # 동아리 물품 구매 또는 관리
+    elif funding_fixture.funding_fixture_type_id in [3, 4]:  # 동아리 물품 구매 또는 관리
         if funding_fixture.is_software == 1:
             transformed_data.update({
                 "club_supplies_name": funding_fixture.fixture_name,
@@ -126,11 +174,22 @@ def transform_funding(source_funding: SourceFunding, target_activity_id: int = N
     
     return transformed_data
 
+# FundingEvidence 종류 -> 증빙 파일 테이블 (비품인 경우 / 아닌 경우)
+funding_evidence_tables = {
+    1: (["funding_trade_evidence_file"], ["funding_trade_evidence_file"]),
+    2: (["funding_trade_detail_file"], ["funding_trade_detail_file"]),
+    3: (["funding_etc_expense_file"], ["funding_etc_expense_file"]),
+    # 비품인 경우 두 테이블에 모두 추가
+    4: (["funding_fixture_image_file", "funding_club_supplies_image_file"], ["funding_club_supplies_image_file"]),
+    5: (["funding_fixture_software_evidence_file", "funding_club_supplies_software_evidence_file"], ["funding_club_supplies_software_evidence_file"]),
+}
+
 async def transform_funding_evidence_files(
-        source_funding: SourceFunding,
-        target_funding: TargetFunding,
-        source_evidences: List[SourceFundingEvidence],
-        target_funding_id: int
+        source_funding: FundingRow,
+        transformed_funding: Dict,
+        source_evidences: List[FundingEvidenceRow],
+        evidence_transfer: EvidenceTransfer,
+        target_funding_id: int = None
     ) -> List[Dict]:
     """
     FundingEvidence 파일들을 새로운 시스템으로 변환
@@ -139,155 +198,98 @@ async def transform_funding_evidence_files(
     3. 파일 업로드
     4. 결과 반환
     """
-    # tmp 디렉토리 초기화
-    TMP_DIR = "tmp"
-    if os.path.exists(TMP_DIR):
-        shutil.rmtree(TMP_DIR)
-    os.makedirs(TMP_DIR)
-
-    try:
-        # 파일 다운로드 및 메타데이터 준비
-        file_metadatas = []
-        downloaded_files = []
-        file_infos = []  # 각 파일의 메타데이터와 테이블 정보를 함께 저장
-        
-        async with aiohttp.ClientSession() as session:
-            for evidence in source_evidences:
-                file_name = evidence.description
-                tmp_path = os.path.join(TMP_DIR, file_name)
-                
-                # 파일 다운로드
-                async with session.get(evidence.image_url) as response:
-                    if response.status != 200:
-                        raise Exception(f"Failed to download file: {file_name}")
-                    
-                    async with aiofiles.open(tmp_path, 'wb') as f:
-                        await f.write(await response.read())
-                
-                # 파일 메타데이터 준비
-                file_size = os.path.getsize(tmp_path)
-                file_type = file_name.split('.')[-1]
-                file_metadata = {
-                    "name": file_name,
-                    "type": f"image/{file_type}",
-                    "size": file_size
-                }
-
-                # 테이블 결정 및 메타데이터와 함께 저장
-                if evidence.funding_evidence_type_id == 1:
-                    file_infos.append({"metadata": file_metadata, "table_name": "funding_trade_evidence_file", "path": tmp_path})
-                elif evidence.funding_evidence_type_id == 2:
-                    file_infos.append({"metadata": file_metadata, "table_name": "funding_trade_detail_file", "path": tmp_path})
-                elif evidence.funding_evidence_type_id == 3:
-                    file_infos.append({"metadata": file_metadata, "table_name": "funding_etc_expense_file", "path": tmp_path})
-                elif evidence.funding_evidence_type_id == 4:
-                    if target_funding.is_fixture:
-                        # 비품인 경우 두 테이블에 모두 추가
-                        file_infos.append({"metadata": file_metadata, "table_name": "funding_fixture_image_file", "path": tmp_path})
-                        file_infos.append({"metadata": file_metadata, "table_name": "funding_club_supplies_image_file", "path": tmp_path})
-                    else:
-                        file_infos.append({"metadata": file_metadata, "table_name": "funding_club_supplies_image_file", "path": tmp_path})
-                elif evidence.funding_evidence_type_id == 5:
-                    if target_funding.is_fixture:
-                        # 비품인 경우 두 테이블에 모두 추가
-                        file_infos.append({"metadata": file_metadata, "table_name": "funding_fixture_software_evidence_file", "path": tmp_path})
-                        file_infos.append({"metadata": file_metadata, "table_name": "funding_club_supplies_software_evidence_file", "path": tmp_path})
-                    else:
-                        file_infos.append({"metadata": file_metadata, "table_name": "funding_club_supplies_software_evidence_file", "path": tmp_path})
-
-        # API를 통해 업로드 URL 획득
-        headers = {"Authorization": f"Bearer {API_ACCESS_TOKEN}"}
-        max_retries = 3
-        
-        # 메타데이터 리스트 생성
-        file_metadatas = [info["metadata"] for info in file_infos]
-        
-        async def try_api_call():
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{API_BASE_URL}/files/upload",
-                    json={"metadata": file_metadatas},
-                    headers=headers
-                ) as response:
-                    if response.status != 201:
-                        raise Exception("Failed to get upload URLs")
-                    return await response.json()
-
-        # API 호출 재시도 로직
-        for attempt in range(max_retries):
-            try:
-                api_response = await try_api_call()
-                break
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                await asyncio.sleep(1)
-
-        # 파일 업로드
-        results = []
-        for idx, url_info in enumerate(api_response["urls"]):
-            file_path = file_infos[idx]["path"]
-            
-            async with aiohttp.ClientSession() as session:
-                async with aiofiles.open(file_path, 'rb') as f:
-                    file_content = await f.read()
-                    
-                async with session.put(url_info["uploadUrl"], data=file_content) as response:
-                    if response.status != 200:
-                        raise Exception(f"Failed to upload file: {url_info['name']}")
-            
-            results.append({
-                "funding_id": target_funding_id,
-                "file_id": url_info["fileId"],
-                "created_at": source_funding.recent_edit,
-                "table_name": file_infos[idx]["table_name"]
-            })
-
-        return results
+    # 테이블 결정 및 파일 정보와 함께 저장
+    files = []
+    table_names = []
+    for evidence in source_evidences:
+        if evidence.funding_evidence_type_id not in funding_evidence_tables:
+            continue
+        fixture_tables, tables = funding_evidence_tables[evidence.funding_evidence_type_id]
+        for table_name in (fixture_tables if transformed_funding.get("is_fixture") else tables):
+            files.append({"url": evidence.image_url, "name": evidence.description})
+            table_names.append(table_name)
 
-    finally:
-        # 임시 파일 정리
-        if os.path.exists(TMP_DIR):
-            shutil.rmtree(TMP_DIR)
+    file_ids = await evidence_transfer.transfer(files)
 
-def transform_funding_transportation_passengers(
-        source_funding: SourceFunding,
-        target_students: List[TargetStudent],
-        target_funding_id: int
-    ) -> List[Dict]:
     return [
         {
             "funding_id": target_funding_id,
-            "student_id": target_student.id,
+            "file_id": file_id,
             "created_at": source_funding.recent_edit,
+            "table_name": table_name
         }
-        for target_student in target_students
+        for file_id, table_name in zip(file_ids, table_names)
     ]
 
+def transform_funding_transportation_passengers(
+        source_funding: FundingRow,
+        source_transportation_members: List[FundingTransportationMemberRow],
+        identity_index: IdentityIndex,
+        target_funding_id: int
+    ) -> List[Dict]:
+    return transform_funding_transportation_passengers_batch(
+        [source_funding], {source_funding.id: source_transportation_members}, identity_index, [target_funding_id]
+    )
+
+def transform_funding_transportation_passengers_batch(
+        source_fundings: List[FundingRow],
+        source_transportation_members: Dict[int, List[FundingTransportationMemberRow]],
+        identity_index: IdentityIndex,
+        target_funding_ids: List[int]
+    ) -> List[Dict]:
+    """source_transportation_members: 원본 funding id -> FundingTransportationMember 목록"""
+    student_ids = identity_index.student_ids
+
+    transformed_passengers = []
+    for source_funding, target_funding_id in zip(source_fundings, target_funding_ids):
+        created_at = source_funding.recent_edit
+        for member in source_transportation_members.get(source_funding.id, ()):
+            if member.student_id in student_ids:
+                transformed_passengers.append({
+                    "funding_id": target_funding_id,
+                    "student_id": student_ids[member.student_id],
+                    "created_at": created_at,
+                })
+    return transformed_passengers
+
 def transform_funding_feedbacks(
-        source_funding: SourceFunding,
-        source_funding_feedbacks: List[SourceFundingFeedback],
-        target_executives: List[TargetExecutive],
+        source_funding: FundingRow,
+        source_funding_feedbacks: List[FundingFeedbackRow],
+        identity_index: IdentityIndex,
         target_funding_id: int
     ) -> List[Dict]:
-    target_executive_map = {target_executive.student.number: target_executive.id for target_executive in target_executives}
+    return transform_funding_feedbacks_batch(
+        [source_funding], {source_funding.id: source_funding_feedbacks}, identity_index, [target_funding_id]
+    )
 
-    # created_at으로 중복 제거를 위한 임시 딕셔너리
-    unique_feedbacks = {}
-    
-    for feedback in source_funding_feedbacks:
-        if feedback.student_id not in target_executive_map:
-            continue
-            
-        created_at = feedback.added_time
-        # 동일한 시간에 대해 가장 마지막 피드백만 유지
-        unique_feedbacks[created_at] = {
-            "funding_id": target_funding_id,
-            "executive_id": target_executive_map[feedback.student_id],
-            "funding_status_enum": funding_status_mapping.get(source_funding.funding_feedback_type, 1),
-            "approved_amount": source_funding.approved_amount,
-            "feedback": feedback.feedback,
-            "created_at": created_at,
-        }
-    
-    return list(unique_feedbacks.values())
+def transform_funding_feedbacks_batch(
+        source_fundings: List[FundingRow],
+        source_funding_feedbacks: Dict[int, List[FundingFeedbackRow]],
+        identity_index: IdentityIndex,
+        target_funding_ids: List[int]
+    ) -> List[Dict]:
+    """source_funding_feedbacks: 원본 funding id -> FundingFeedback 목록"""
+    target_executive_map = identity_index.executive_ids
+
+    transformed_feedbacks = []
+    for source_funding, target_funding_id in zip(source_fundings, target_funding_ids):
+        funding_status_enum = funding_status_mapping.get(source_funding.funding_feedback_type, 1)
+
+        # created_at으로 중복 제거를 위한 임시 딕셔너리
+        unique_feedbacks = {}
+        for feedback in source_funding_feedbacks.get(source_funding.id, ()):
+            if feedback.student_id not in target_executive_map:
+                continue
+
+            created_at = feedback.added_time
+            # 동일한 시간에 대해 가장 마지막 피드백만 유지
+            unique_feedbacks[created_at] = {
+                "funding_id": target_funding_id,
+                "executive_id": target_executive_map[feedback.student_id],
+                "funding_status_enum": funding_status_enum,
+                "approved_amount": source_funding.approved_amount,
+                "feedback": feedback.feedback,
+                "created_at": created_at,
+            }
+        transformed_feedbacks.extend(unique_feedbacks.values())
+    return transformed_feedbacks
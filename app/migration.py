@@ -0,0 +1,96 @@
+from app.activity.model.source import Activity as SourceActivity
+from app.activity.service.migration import migrate_club_activities, load_activity_sign_map
+from app.funding.model.source import Funding as SourceFunding
+from app.funding.service.migration import migrate_club_fundings
+from app.common.service.checkpoint import CheckpointStore
+from app.common.service.database import open_source_session, run_db, close_session
+from app.common.service.dead_letter import DeadLetterStore
+from app.common.service.metrics import metrics
+from app.common.service.run import migration_run
+from app.common.service.worker import run_clubs
+from config import CLUB_CONCURRENCY, INCREMENTAL_SYNC
+
+async def migrate_all(identity_index=None, refresh_identity_index=False, concurrency=CLUB_CONCURRENCY, checkpoint=None, file_cache=None, incremental=INCREMENTAL_SYNC, dead_letters=None):
+    """
+    activity와 funding 마이그레이션을 club 단위 의존 관계에 따라 함께 실행한다.
+    club마다 activity -> funding 순서로 진행하므로 그 club의 activity가 끝나는 즉시 funding을 시작하고,
+    그동안 다른 club의 activity는 concurrency개의 워커에서 계속 진행된다.
+    activity가 끝나지 않은 club(오류)의 funding은 purpose activity를 찾을 수 없으므로 다음 실행으로 미룬다.
+    funding의 purpose는 같은 club의 activity를 가리킨다고 보고, 다른 club의 activity가 아직 옮겨지지 않았으면 그 funding은 dead letter로 남긴다.
+    incremental이면 워터마크 이후 바뀐 row만 옮기고, 이미 옮긴 row는 id 매핑으로 찾은 타겟 row를 갱신한다.
+    """
+    async with migration_run({"activity": SourceActivity, "funding": SourceFunding}, identity_index, refresh_identity_index, checkpoint, file_cache, incremental, dead_letters) as run:
+        # 클럽별 semester_id -> 최신 sign_time 맵은 전체 테이블에서 한 번만 계산
+        source_session = open_source_session()
+        activity_sign_map = await run_db(source_session, load_activity_sign_map)
+        await close_session(source_session)
+
+        # 원본 activity id -> 타겟 activity id. club의 activity가 끝날 때마다 그 club의 매핑을 더한다
+        activity_id_map = run.checkpoint.migrated_rows("activity")
+        activity_plan, funding_plan = run.plans["activity"], run.plans["funding"]
+
+        async def migrate_club(club_id):
+            logs = []
+            if club_id in activity_plan.club_deltas:
+                logs += await migrate_club_activities(club_id, run.identity_index, activity_sign_map.get(club_id, {}), run.evidence_transfer, run.checkpoint, run.transform_pool, activity_plan.club_deltas[club_id], run.dead_letters)
+                activity_id_map.update(run.checkpoint.migrated_rows("activity", club_id))
+                if not run.checkpoint.is_club_completed("activity", club_id):
+                    logs.append(f"Skipping funding migration until activities are completed. clubId: {club_id}")
+                    return logs
+            if club_id in funding_plan.club_deltas:
+                logs += await migrate_club_fundings(club_id, run.identity_index, activity_id_map, run.evidence_transfer, run.checkpoint, run.transform_pool, funding_plan.club_deltas[club_id], run.dead_letters)
+            return logs
+
+        await run_clubs(sorted(activity_plan.club_deltas.keys() | funding_plan.club_deltas.keys()), migrate_club, concurrency)
+
+async def replay_dead_letters(entities=("activity", "funding"), identity_index=None, refresh_identity_index=False, concurrency=CLUB_CONCURRENCY, checkpoint=None, file_cache=None, dead_letters=None):
+    """
+    dead letter에 남은 row만 다시 마이그레이션한다. (전체 데이터가 아니라 실패한 row 수만큼만 읽고 쓴다)
+    club마다 남은 원본 id만 조건으로 읽어 activity -> funding 순서로 다시 쓰고, 이미 타겟에 있는 row는 id 매핑으로 찾은 타겟 row를 갱신한다.
+    커밋된 row는 dead letter에서 지워지고, 다시 실패한 row는 오류와 시도 횟수가 갱신된다.
+    읽지 않은 다른 row가 남아 있을 수 있으므로 club의 완료 여부는 바꾸지 않는다. (다음 전체 실행이 확인한다)
+    """
+    if checkpoint is None:
+        checkpoint = CheckpointStore()
+    if dead_letters is None:
+        dead_letters = DeadLetterStore()
+
+    # entity -> {club_id: [원본 id]}
+    pending = {entity: dead_letters.pending(entity) for entity in entities}
+    if not any(pending.values()):
+        print("No dead letters to replay")
+        return
+    completed_club_ids = {entity: checkpoint.completed_clubs(entity) for entity in entities}
+    for entity in entities:
+        total = sum(len(source_ids) for source_ids in pending[entity].values())
+        metrics.set_total(entity, total)
+        print(f"Replaying {total} {entity} dead letters in {len(pending[entity])} clubs")
+
+    async with migration_run({}, identity_index, refresh_identity_index, checkpoint, file_cache, dead_letters=dead_letters) as run:
+        activity_sign_map = {}
+        if pending.get("activity"):
+            source_session = open_source_session()
+            activity_sign_map = await run_db(source_session, load_activity_sign_map)
+            await close_session(source_session)
+
+        activity_id_map = checkpoint.migrated_rows("activity")
+
+        async def replay_club(club_id):
+            logs = []
+            activity_ids = pending.get("activity", {}).get(club_id)
+            if activity_ids:
+                logs += await migrate_club_activities(club_id, run.identity_index, activity_sign_map.get(club_id, {}), run.evidence_transfer, checkpoint, run.transform_pool, SourceActivity.id.in_(activity_ids), dead_letters)
+                activity_id_map.update(checkpoint.migrated_rows("activity", club_id))
+            funding_ids = pending.get("funding", {}).get(club_id)
+            if funding_ids:
+                logs += await migrate_club_fundings(club_id, run.identity_index, activity_id_map, run.evidence_transfer, checkpoint, run.transform_pool, SourceFunding.id.in_(funding_ids), dead_letters)
+            # migrate_club_*은 읽은 row가 모두 성공하면 club을 완료로 표시하므로 원래 상태로 되돌린다
+            for entity in entities:
+                if club_id in pending[entity] and club_id not in completed_club_ids[entity]:
+                    checkpoint.unmark_clubs_completed(entity, [club_id])
+            return logs
+
+        await run_clubs(sorted(set().union(*(pending[entity].keys() for entity in entities))), replay_club, concurrency)
+
+    remaining = sum(len(source_ids) for entity in entities for source_ids in dead_letters.pending(entity).values())
+    print(f"Dead letter replay finished: {remaining} rows still failing")
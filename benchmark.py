@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from urllib.parse import urlparse
+
+from app.activity.service.migration import migrate_activities
+from app.benchmark.file_api import FileApiStub
+from app.benchmark.synthetic import Scale, SOURCE_METADATAS, TARGET_METADATAS, recreate_schema, seed_source, seed_target_identities
+from app.common.service.checkpoint import CheckpointStore
+from app.common.service.dead_letter import DeadLetterStore
+from app.common.service.evidence import FileIdCache
+from app.common.service.metrics import metrics
+from app.common.service.profiler import query_profiler
+from app.funding.service.migration import migrate_fundings
+from app.migration import migrate_all
+from config import API_BASE_URL, source_engine, target_engine
+
+LOCAL_HOSTS = (None, "", "localhost", "127.0.0.1", "::1")
+
+def parse_args():
+    defaults = Scale()
+    parser = argparse.ArgumentParser(
+        description="합성 원본 데이터와 로컬 파일 API 스텁으로 migrate_activities / migrate_fundings 처리량을 측정한다. "
+                    "config.py의 원본/타겟 DB와 API_BASE_URL은 모두 로컬(SQLite 또는 로컬 MySQL)이어야 하며, 모델 테이블을 지우고 다시 만든다."
+    )
+    parser.add_argument("--clubs", type=int, default=defaults.clubs)
+    parser.add_argument("--activities-per-club", type=int, default=defaults.activities_per_club)
+    parser.add_argument("--fundings-per-club", type=int, default=defaults.fundings_per_club)
+    parser.add_argument("--members-per-activity", type=int, default=defaults.members_per_activity)
+    parser.add_argument("--evidences-per-activity", type=int, default=defaults.evidences_per_activity)
+    parser.add_argument("--evidences-per-funding", type=int, default=defaults.evidences_per_funding)
+    parser.add_argument("--students", type=int, default=defaults.students)
+    parser.add_argument("--file-size", type=int, default=defaults.file_size, help="증빙 파일 하나의 크기(byte)")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--download-latency", type=float, default=0.0, help="원본 증빙 GET/HEAD 응답 지연(초)")
+    parser.add_argument("--upload-url-latency", type=float, default=0.0, help="/files/upload 응답 지연(초)")
+    parser.add_argument("--upload-latency", type=float, default=0.0, help="업로드 PUT 응답 지연(초)")
+    parser.add_argument("--all", action="store_true", help="activity/funding을 차례로 실행하지 않고 migrate_all로 club 단위 의존 관계에 따라 함께 실행한다")
+    parser.add_argument("--profile-queries", action="store_true", help="SQL 쿼리 수와 N+1 의심 쿼리를 함께 보고한다")
+    parser.add_argument(
+        "--max-queries-per-row", type=float, default=None,
+        help="--profile-queries일 때 부모 row당 쿼리 수가 이 값을 넘거나 N+1 의심 쿼리가 있으면 종료 코드 1로 끝낸다"
+    )
+    return parser.parse_args()
+
+def check_local():
+    """운영 DB/API를 덮어쓰지 않도록 로컬 대상일 때만 실행한다."""
+    for name, engine in (("source", source_engine), ("target", target_engine)):
+        if engine.url.get_backend_name() != "sqlite" and engine.url.host not in LOCAL_HOSTS:
+            raise SystemExit(f"Benchmark refuses to run against non-local {name} database: {engine.url.host}")
+    if urlparse(API_BASE_URL).hostname not in LOCAL_HOSTS:
+        raise SystemExit(f"API_BASE_URL must point at the local file API stub: {API_BASE_URL}")
+
+async def run_benchmark(args):
+    scale = Scale(
+        clubs=args.clubs,
+        activities_per_club=args.activities_per_club,
+        fundings_per_club=args.fundings_per_club,
+        members_per_activity=args.members_per_activity,
+        evidences_per_activity=args.evidences_per_activity,
+        evidences_per_funding=args.evidences_per_funding,
+        students=args.students,
+        file_size=args.file_size,
+        seed=args.seed,
+    )
+
+    # 합성 데이터 준비
+    recreate_schema(source_engine, SOURCE_METADATAS)
+    recreate_schema(target_engine, TARGET_METADATAS)
+    seed_target_identities(target_engine, scale)
+    counts = seed_source(source_engine, scale, API_BASE_URL)
+    print("Seeded source:", ", ".join(f"{table}={count}" for table, count in counts.items()))
+
+    # 시드 쿼리는 세지 않도록 데이터 준비 후에 붙인다
+    if args.profile_queries:
+        query_profiler.install()
+
+    api = urlparse(API_BASE_URL)
+    stub = FileApiStub(args.download_latency, args.upload_url_latency, args.upload_latency)
+    await stub.start(api.hostname, api.port or 80)
+
+    results = []
+    # 이전 실행의 체크포인트/파일 캐시/dead letter에 영향받지 않도록 임시 파일을 쓴다
+    with tempfile.TemporaryDirectory() as workdir:
+        checkpoint = CheckpointStore(os.path.join(workdir, "checkpoint.sqlite3"))
+        file_cache = FileIdCache(os.path.join(workdir, "evidence_cache.sqlite3"))
+        dead_letters = DeadLetterStore(os.path.join(workdir, "dead_letter.sqlite3"))
+        try:
+            if args.all:
+                started = time.perf_counter()
+                await migrate_all(checkpoint=checkpoint, file_cache=file_cache, dead_letters=dead_letters)
+                elapsed = time.perf_counter() - started
+                results.append(("all", metrics.rows["activity"] + metrics.rows["funding"], stub.uploaded_files, elapsed))
+            else:
+                for entity, migrate in (("activity", migrate_activities), ("funding", migrate_fundings)):
+                    files_before = stub.uploaded_files
+                    started = time.perf_counter()
+                    await migrate(checkpoint=checkpoint, file_cache=file_cache, dead_letters=dead_letters)
+                    elapsed = time.perf_counter() - started
+                    results.append((entity, metrics.rows[entity], stub.uploaded_files - files_before, elapsed))
+        finally:
+            await stub.stop()
+            file_cache.close()
+            dead_letters.close()
+            checkpoint.close()
+
+    print()
+    print(f"{'entity':<10}{'rows':>10}{'files':>10}{'seconds':>10}{'rows/s':>12}{'files/s':>12}")
+    for entity, rows, files, elapsed in results:
+        print(f"{entity:<10}{rows:>10}{files:>10}{elapsed:>10.2f}{rows / elapsed:>12.1f}{files / elapsed:>12.1f}")
+    print(f"upload URL requests: {stub.upload_url_requests}, uploaded bytes: {stub.uploaded_bytes}, dead letters: {dead_letters.count}")
+
+    if args.profile_queries:
+        return report_queries(args.max_queries_per_row)
+    return True
+
+def report_queries(max_queries_per_row) -> bool:
+    """entity별 부모 row당 쿼리 수와 N+1 의심 쿼리를 출력하고, 기준을 넘지 않았는지 반환한다."""
+    passed = True
+    for entity, queries in query_profiler.to_dict().items():
+        print()
+        print(f"[{entity}] {queries['statements']} statements, {queries['statements_per_row']} per {entity} row")
+        for query in queries["n_plus_one"]:
+            print(f"  N+1 suspect ({query['per_row']} per row): {query['sql'][:200]}")
+        if max_queries_per_row is not None:
+            if queries["n_plus_one"] or (queries["statements_per_row"] or 0) > max_queries_per_row:
+                passed = False
+    return passed
+
+if __name__ == "__main__":
+    args = parse_args()
+    check_local()
+    if not asyncio.run(run_benchmark(args)):
+        raise SystemExit(1)
@@ -1,7 +1,6 @@
 import asyncio
-from app.activity.service.migration import migrate_activities
-from app.funding.service.migration import migrate_fundings
+from app.migration import migrate_all
 
 if __name__ == "__main__":
-    # asyncio.run(migrate_activities())
-    asyncio.run(migrate_fundings())
\ No newline at end of file
+    # club마다 activity -> funding 순서로, club끼리는 동시에 마이그레이션
+    asyncio.run(migrate_all())
\ No newline at end of file
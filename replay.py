@@ -0,0 +1,24 @@
+import argparse
+import asyncio
+import json
+
+from app.common.service.dead_letter import DeadLetterStore
+from app.migration import replay_dead_letters
+
+ENTITIES = ("activity", "funding")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="dead letter에 남은 activity/funding row만 다시 마이그레이션한다.")
+    parser.add_argument("--entity", choices=ENTITIES, action="append", help="다시 처리할 entity (여러 번 지정 가능, 생략하면 모두)")
+    parser.add_argument("--list", action="store_true", help="다시 처리하지 않고 남은 항목을 JSON Lines로 출력한다")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    # funding의 purpose activity를 먼저 옮기도록 항상 activity -> funding 순서
+    entities = tuple(entity for entity in ENTITIES if not args.entity or entity in args.entity)
+    if args.list:
+        for entry in DeadLetterStore().entries(entities):
+            print(json.dumps(entry, ensure_ascii=False))
+    else:
+        asyncio.run(replay_dead_letters(entities))
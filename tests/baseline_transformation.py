@@ -0,0 +1,240 @@
+"""
+배치 변환을 넣기 전의 row 단위 변환 함수 사본 (묶음 변환과의 동일성 기준)
+app의 row 단위 함수는 이제 묶음 함수에 위임하므로, 비교 기준은 바뀌지 않도록 여기 고정해 둔다.
+"""
+import datetime
+from typing import List, Dict
+
+from app.activity.model.record import ActivityRow, ActivityFeedbackRow, ActivityMemberRow
+from app.common.service.identity import IdentityIndex
+from app.funding.model.record import FundingRow, FundingFeedbackRow, FundingFixtureRow, FundingTransportationMemberRow
+
+def transform_activity(
+        source_activity: ActivityRow,
+        activity_sign: Dict[int, datetime.datetime]
+    ) -> Dict:
+    # recent_edit이 2024-03-01 이전이면 activity_d_id를 7로 설정
+    if (source_activity.recent_edit < datetime.datetime(2024, 3, 1)):
+        activity_d_id = 7
+    else:
+        activity_d_id = 2
+
+    if (source_activity.activity_type_id == 1):
+        activity_type_enum_id = 3
+    elif (source_activity.activity_type_id == 2):
+        activity_type_enum_id = 1
+    else:
+        activity_type_enum_id = 2
+
+    # semester_id -> 최신 sign_time 맵에서 activity_d_id = 7 일경우 14, 아닐경우 15학기의 서명 시각을 찾아서 반환
+    if (activity_d_id == 7):
+        professor_approved_at = activity_sign.get(14)
+    else:
+        professor_approved_at = activity_sign.get(15)
+
+    # 데이터 변환 로직
+    return {
+        "club_id": source_activity.club_id,
+        "original_name": source_activity.title,
+        "name": source_activity.title,
+        "activity_d_id": activity_d_id,
+        "activity_status_enum_id": source_activity.feedback_type,
+        "activity_type_enum_id": activity_type_enum_id,
+        "location": source_activity.location,
+        "purpose": source_activity.purpose,
+        "detail": source_activity.content,
+        "evidence": source_activity.proof_text or "",
+        "created_at": source_activity.recent_edit,
+        "updated_at": source_activity.recent_feedback or source_activity.recent_edit,
+        "professor_approved_at": professor_approved_at,
+    }
+
+def transform_activity_t(
+        source_activity: ActivityRow,
+        target_activity_id: int
+    ) -> Dict:
+    return {
+        "activity_id": target_activity_id,
+        "start_term": source_activity.start_date,
+        "end_term": source_activity.end_date,
+        "created_at": source_activity.recent_edit,
+    }
+
+def transform_activity_participants(
+        source_activity: ActivityRow,
+        source_activity_participants: List[ActivityMemberRow],
+        identity_index: IdentityIndex,
+        target_activity_id: int
+    ) -> List[Dict]:
+    target_student_ids = [identity_index.student_ids[participant.member_student_id]
+                          for participant in source_activity_participants
+                          if participant.member_student_id in identity_index.student_ids]
+
+    return [
+        {
+            "activity_id": target_activity_id,
+            "student_id": target_student_id,
+            "created_at": source_activity.recent_edit,
+        }
+        for target_student_id in target_student_ids
+    ]
+
+def transform_activity_feedbacks(
+        source_activity_feedbacks: List[ActivityFeedbackRow],
+        identity_index: IdentityIndex,
+        target_activity_id: int
+    ) -> List[Dict]:
+    return [
+        {
+            "activity_id": target_activity_id,
+            "executive_id": identity_index.executive_ids[source_activity_feedback.student_id],
+            "comment": source_activity_feedback.feedback,
+            "created_at": source_activity_feedback.added_time,
+        }
+        for source_activity_feedback in source_activity_feedbacks
+        if source_activity_feedback.feedback != ""
+    ]
+
+# 상태 매핑
+funding_status_mapping = {
+    1: 1,  # 검토전 -> Applied
+    2: 2,  # 전체승인 -> Approved
+    3: 5,  # 부분승인 -> Partial
+    4: 3   # 미승인 -> Rejected
+}
+
+# 비품 분류 매핑
+fixture_class_mapping = {
+    1: 1,  # 전자기기
+    2: 2,  # 가구
+    3: 3,  # 악기
+    4: 5   # 기타
+}
+
+def transform_funding(source_funding: FundingRow, target_activity_id: int = None, funding_fixture: FundingFixtureRow = None) -> Dict:
+    activity_d_id = 7 if source_funding.recent_edit < datetime.datetime(2024, 3, 1) else 2
+
+    # 기본 데이터 변환
+    transformed_data = {
+        "club_id": source_funding.club_id,
+        "activity_d_id": activity_d_id,
+        "funding_status_enum": funding_status_mapping.get(source_funding.funding_feedback_type, 1),
+        "purpose_activity_id": target_activity_id,
+        "name": source_funding.name,
+        "expenditure_date": source_funding.expenditure_date,
+        "expenditure_amount": source_funding.expenditure_amount,
+        "approved_amount": source_funding.approved_amount or 0,
+        "trade_detail_explanation": source_funding.additional_explanation or "",
+        "is_transportation": source_funding.is_transportation,
+        "is_non_corporate_transaction": source_funding.is_non_corporate_transaction,
+        "is_food_expense": source_funding.is_food_expense,
+        "is_labor_contract": source_funding.is_labor_contract,
+        "is_external_event_participation_fee": source_funding.is_external_event_participation_fee,
+        "is_publication": source_funding.is_publication,
+        "is_profit_making_activity": source_funding.is_profit_making_activity,
+        "is_joint_expense": source_funding.is_joint_expense,
+        "is_etc_expense": False,
+        "number_of_club_supplies": 0,
+        "price_of_club_supplies": 0,
+        "number_of_fixture": 0,
+        "price_of_fixture": 0,
+        "created_at": source_funding.recent_edit,
+        "edited_at": source_funding.recent_edit,
+        "commented_at": source_funding.recent_feedback,
+    }
+
+    # 비품/물품 데이터 처리
+    if funding_fixture and funding_fixture.funding_fixture_type_id in [1, 2]:  # 비품 구매 또는 비품 관리
+        # 비품인 경우 - 물품과 비품 모두에 데이터 설정
+        if funding_fixture.is_software == 1:
+            transformed_data.update({
+                "club_supplies_name": funding_fixture.fixture_name,
+                "club_supplies_evidence_enum": funding_fixture.funding_fixture_type_id,
+                "club_supplies_class_enum": 4,
+                "club_supplies_software_evidence": funding_fixture.software_proof_text,
+                "is_fixture": True,
+                "fixture_name": funding_fixture.fixture_name,
+                "fixture_evidence_enum": funding_fixture.funding_fixture_type_id,
+                "fixture_class_enum": 4,
+                "fixture_software_evidence": funding_fixture.software_proof_text,
+            })
+        else:
+            transformed_data.update({
+                # 물품 정보
+                "club_supplies_name": funding_fixture.fixture_name,
+                "club_supplies_evidence_enum": funding_fixture.funding_fixture_type_id,
+                "club_supplies_class_enum": fixture_class_mapping.get(funding_fixture.fixture_type_id, 5),
+                "club_supplies_purpose": funding_fixture.usage_purpose,
+                # 비품 정보
+                "is_fixture": True,
+                "fixture_name": funding_fixture.fixture_name,
+                "fixture_evidence_enum": funding_fixture.funding_fixture_type_id,
+                "fixture_class_enum": fixture_class_mapping.get(funding_fixture.fixture_type_id, 5),
+                "fixture_purpose": funding_fixture.usage_purpose
+            })
+    elif funding_fixture and funding_fixture.funding_fixture_type_id in [3, 4]:  # 동아리 물품 구매 또는 관리
+        if funding_fixture.is_software == 1:
+            transformed_data.update({
+                "club_supplies_name": funding_fixture.fixture_name,
+                "club_supplies_evidence_enum": funding_fixture.funding_fixture_type_id - 2,
+                "club_supplies_class_enum": fixture_class_mapping.get(funding_fixture.fixture_type_id, 5),
+                "club_supplies_software_evidence": funding_fixture.software_proof_text,
+                "is_fixture": False
+            })
+        else:
+            transformed_data.update({
+                "club_supplies_name": funding_fixture.fixture_name,
+                "club_supplies_evidence_enum": funding_fixture.funding_fixture_type_id - 2,
+                "club_supplies_class_enum": fixture_class_mapping.get(funding_fixture.fixture_type_id, 5),
+                "club_supplies_purpose": funding_fixture.usage_purpose,
+                "is_fixture": False
+            })
+
+    return transformed_data
+
+def transform_funding_transportation_passengers(
+        source_funding: FundingRow,
+        source_transportation_members: List[FundingTransportationMemberRow],
+        identity_index: IdentityIndex,
+        target_funding_id: int
+    ) -> List[Dict]:
+    target_student_ids = [identity_index.student_ids[member.student_id]
+                          for member in source_transportation_members
+                          if member.student_id in identity_index.student_ids]
+
+    return [
+        {
+            "funding_id": target_funding_id,
+            "student_id": target_student_id,
+            "created_at": source_funding.recent_edit,
+        }
+        for target_student_id in target_student_ids
+    ]
+
+def transform_funding_feedbacks(
+        source_funding: FundingRow,
+        source_funding_feedbacks: List[FundingFeedbackRow],
+        identity_index: IdentityIndex,
+        target_funding_id: int
+    ) -> List[Dict]:
+    target_executive_map = identity_index.executive_ids
+
+    # created_at으로 중복 제거를 위한 임시 딕셔너리
+    unique_feedbacks = {}
+
+    for feedback in source_funding_feedbacks:
+        if feedback.student_id not in target_executive_map:
+            continue
+
+        created_at = feedback.added_time
+        # 동일한 시간에 대해 가장 마지막 피드백만 유지
+        unique_feedbacks[created_at] = {
+            "funding_id": target_funding_id,
+            "executive_id": target_executive_map[feedback.student_id],
+            "funding_status_enum": funding_status_mapping.get(source_funding.funding_feedback_type, 1),
+            "approved_amount": source_funding.approved_amount,
+            "feedback": feedback.feedback,
+            "created_at": created_at,
+        }
+
+    return list(unique_feedbacks.values())
@@ -0,0 +1,27 @@
+import os
+import re
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+def _test_config() -> types.ModuleType:
+    """
+    config.py.example의 설정값으로 만든 테스트용 config 모듈
+    운영 DB에 붙지 않도록 DB URL은 메모리 SQLite로, 체크포인트/캐시/실행 요약/dead letter 파일은 임시 디렉터리로 바꾼다.
+    """
+    source = (ROOT / "config.py.example").read_text(encoding="utf-8")
+    source = re.sub(r'"mysql\+\w+://[^"]*"', '"sqlite://"', source)
+    module = types.ModuleType("config")
+    exec(compile(source, str(ROOT / "config.py.example"), "exec"), module.__dict__)
+
+    workdir = tempfile.mkdtemp(prefix="migration-test-")
+    for name in ("CHECKPOINT_PATH", "EVIDENCE_CACHE_PATH", "METRICS_REPORT_PATH", "DEAD_LETTER_PATH"):
+        setattr(module, name, os.path.join(workdir, os.path.basename(getattr(module, name))))
+    return module
+
+# app 모듈이 import 시점에 config 값을 읽으므로 가장 먼저 바꿔 둔다
+sys.modules["config"] = _test_config()
@@ -0,0 +1,197 @@
+import asyncio
+import socket
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.common.service.database as database
+import benchmark
+import app.common.service.evidence as evidence
+from app.activity.model.target import Activity as TargetActivity, ActivityEvidenceFile as TargetActivityEvidenceFile
+from app.activity.service.migration import migrate_club_activities, load_activity_sign_map
+from app.benchmark.file_api import FileApiStub
+from app.benchmark.synthetic import Scale, SOURCE_METADATAS, TARGET_METADATAS, recreate_schema, seed_source, seed_target_identities
+from app.common.service.checkpoint import CheckpointStore
+from app.common.service.dead_letter import DeadLetterStore
+from app.common.service.evidence import EvidenceTransfer, FileIdCache
+from app.common.service.identity import get_identity_index
+from app.common.service.metrics import metrics
+from app.common.service.profiler import QueryStats, query_profiler
+from app.funding.model.target import Funding as TargetFunding
+from app.funding.service.migration import migrate_club_fundings
+from app.migration import migrate_all, replay_dead_letters
+
+SCALE = Scale(
+    clubs=2, activities_per_club=6, fundings_per_club=5, members_per_activity=2,
+    evidences_per_activity=1, evidences_per_funding=2, students=20, executives=5, file_size=1024,
+)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def async_databases(tmp_path, monkeypatch):
+    """원본/타겟을 SQLite 파일로 만들어 합성 데이터를 넣고, 마이그레이션 세션은 같은 파일의 aiosqlite AsyncSession으로 연다."""
+    source_path, target_path = tmp_path / "source.db", tmp_path / "target.db"
+    file_api_url = f"http://127.0.0.1:{free_port()}"
+
+    source_engine = create_engine(f"sqlite:///{source_path}")
+    target_engine = create_engine(f"sqlite:///{target_path}")
+    recreate_schema(source_engine, SOURCE_METADATAS)
+    recreate_schema(target_engine, TARGET_METADATAS)
+    seed_target_identities(target_engine, SCALE)
+    seed_source(source_engine, SCALE, file_api_url)
+
+    async_source_engine = create_async_engine(f"sqlite+aiosqlite:///{source_path}")
+    async_target_engine = create_async_engine(f"sqlite+aiosqlite:///{target_path}")
+    monkeypatch.setattr(database, "AsyncSourceSession", sessionmaker(bind=async_source_engine, class_=AsyncSession))
+    monkeypatch.setattr(database, "AsyncTargetSession", sessionmaker(bind=async_target_engine, class_=AsyncSession))
+    monkeypatch.setattr(evidence, "API_BASE_URL", file_api_url)
+
+    yield target_engine, file_api_url
+
+    source_engine.dispose()
+    target_engine.dispose()
+    async_source_engine.sync_engine.dispose()
+    async_target_engine.sync_engine.dispose()
+
+def test_club_migrations_run_on_async_sessions(async_databases, tmp_path):
+    target_engine, file_api_url = async_databases
+    checkpoint = CheckpointStore(str(tmp_path / "checkpoint.sqlite3"))
+    file_cache = FileIdCache(str(tmp_path / "evidence_cache.sqlite3"))
+    dead_letters = DeadLetterStore(str(tmp_path / "dead_letter.sqlite3"))
+    club_ids = range(1, SCALE.clubs + 1)
+
+    async def migrate():
+        assert isinstance(database.open_target_session(), AsyncSession)
+        stub = FileApiStub()
+        host, port = file_api_url.rsplit(":", 1)
+        await stub.start(host.removeprefix("http://"), int(port))
+        try:
+            # 인덱스와 서명 맵도 run_db로 AsyncSession의 run_sync 위에서 읽는다
+            target_session = database.open_target_session()
+            identity_index = await database.run_db(target_session, get_identity_index, True)
+            await database.close_session(target_session)
+            source_session = database.open_source_session()
+            activity_sign_map = await database.run_db(source_session, load_activity_sign_map)
+            await database.close_session(source_session)
+
+            async with EvidenceTransfer(cache=file_cache) as evidence_transfer:
+                for club_id in club_ids:
+                    await migrate_club_activities(club_id, identity_index, activity_sign_map.get(club_id, {}), evidence_transfer, checkpoint, dead_letters=dead_letters)
+                activity_id_map = checkpoint.migrated_rows("activity")
+                for club_id in club_ids:
+                    await migrate_club_fundings(club_id, identity_index, activity_id_map, evidence_transfer, checkpoint, dead_letters=dead_letters)
+        finally:
+            await stub.stop()
+        return stub
+
+    try:
+        stub = asyncio.run(migrate())
+    finally:
+        file_cache.close()
+        dead_letters.close()
+
+    activities = SCALE.clubs * SCALE.activities_per_club
+    fundings = SCALE.clubs * SCALE.fundings_per_club
+    with target_engine.connect() as connection:
+        assert connection.scalar(select(func.count()).select_from(TargetActivity)) == activities
+        assert connection.scalar(select(func.count()).select_from(TargetActivityEvidenceFile)) == activities * SCALE.evidences_per_activity
+        assert connection.scalar(select(func.count()).select_from(TargetFunding)) == fundings
+        # purpose는 같은 club의 activity를 가리키므로 모두 타겟 id로 연결된다
+        assert connection.scalar(select(func.count()).select_from(TargetFunding).where(TargetFunding.purpose_activity_id.is_(None))) == 0
+
+    assert len(checkpoint.migrated_rows("activity")) == activities
+    assert len(checkpoint.migrated_rows("funding")) == fundings
+    assert checkpoint.completed_clubs("activity") == set(club_ids)
+    assert checkpoint.completed_clubs("funding") == set(club_ids)
+    assert dead_letters.count == 0
+    assert stub.uploaded_files > 0
+    checkpoint.close()
+
+def test_funding_with_unmigrated_purpose_is_dead_lettered_until_replay(async_databases, tmp_path):
+    target_engine, file_api_url = async_databases
+    checkpoint = CheckpointStore(str(tmp_path / "checkpoint.sqlite3"))
+    file_cache = FileIdCache(str(tmp_path / "evidence_cache.sqlite3"))
+    dead_letters = DeadLetterStore(str(tmp_path / "dead_letter.sqlite3"))
+    club_ids = range(1, SCALE.clubs + 1)
+    fundings = SCALE.clubs * SCALE.fundings_per_club
+
+    def count_fundings(*criteria):
+        with target_engine.connect() as connection:
+            return connection.scalar(select(func.count()).select_from(TargetFunding).where(*criteria))
+
+    async def migrate():
+        stub = FileApiStub()
+        host, port = file_api_url.rsplit(":", 1)
+        await stub.start(host.removeprefix("http://"), int(port))
+        try:
+            target_session = database.open_target_session()
+            identity_index = await database.run_db(target_session, get_identity_index, True)
+            await database.close_session(target_session)
+
+            # purpose activity를 옮기기 전에 funding을 먼저 옮기면 NULL로 쓰지 않고 dead letter로 남긴다
+            async with EvidenceTransfer(cache=file_cache) as evidence_transfer:
+                for club_id in club_ids:
+                    await migrate_club_fundings(club_id, identity_index, {}, evidence_transfer, checkpoint, dead_letters=dead_letters)
+            assert count_fundings() == 0
+            assert sum(len(source_ids) for source_ids in dead_letters.pending("funding").values()) == fundings
+            assert checkpoint.completed_clubs("funding") == set()
+
+            # activity를 옮긴 뒤 replay하면 purpose가 연결된다
+            source_session = database.open_source_session()
+            activity_sign_map = await database.run_db(source_session, load_activity_sign_map)
+            await database.close_session(source_session)
+            async with EvidenceTransfer(cache=file_cache) as evidence_transfer:
+                for club_id in club_ids:
+                    await migrate_club_activities(club_id, identity_index, activity_sign_map.get(club_id, {}), evidence_transfer, checkpoint, dead_letters=dead_letters)
+            await replay_dead_letters(("funding",), identity_index, checkpoint=checkpoint, file_cache=file_cache, dead_letters=dead_letters)
+        finally:
+            await stub.stop()
+
+    try:
+        asyncio.run(migrate())
+        assert count_fundings() == fundings
+        assert count_fundings(TargetFunding.purpose_activity_id.is_(None)) == 0
+        assert dead_letters.pending("funding") == {}
+    finally:
+        file_cache.close()
+        dead_letters.close()
+        checkpoint.close()
+
+def test_clean_run_passes_query_gate(async_databases, tmp_path, monkeypatch):
+    target_engine, file_api_url = async_databases
+    checkpoint = CheckpointStore(str(tmp_path / "checkpoint.sqlite3"))
+    file_cache = FileIdCache(str(tmp_path / "evidence_cache.sqlite3"))
+    dead_letters = DeadLetterStore(str(tmp_path / "dead_letter.sqlite3"))
+    monkeypatch.setattr(metrics, "rows", defaultdict(int))
+    monkeypatch.setattr(query_profiler, "stats", defaultdict(lambda: defaultdict(QueryStats)))
+    query_profiler.install(*(factory.kw["bind"].sync_engine for factory in (database.AsyncSourceSession, database.AsyncTargetSession)))
+
+    async def migrate():
+        stub = FileApiStub()
+        host, port = file_api_url.rsplit(":", 1)
+        await stub.start(host.removeprefix("http://"), int(port))
+        try:
+            await migrate_all(checkpoint=checkpoint, file_cache=file_cache, dead_letters=dead_letters)
+        finally:
+            await stub.stop()
+
+    try:
+        asyncio.run(migrate())
+    finally:
+        file_cache.close()
+        dead_letters.close()
+        checkpoint.close()
+
+    # SQLite는 순서 보장 RETURNING insert를 row마다 나눠 보내지만 묶음 하나로 실행한 부모 insert는 N+1이 아니다
+    report = query_profiler.to_dict()
+    assert report["activity"]["parent_rows"] == SCALE.clubs * SCALE.activities_per_club
+    assert report["funding"]["parent_rows"] == SCALE.clubs * SCALE.fundings_per_club
+    assert all(queries["n_plus_one"] == [] for queries in report.values())
+    assert benchmark.report_queries(max_queries_per_row=5)
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.common.service.database import ChunkedCommitter
+
+class FakeSession:
+    """commit/rollback 호출만 기록하는 동기 세션"""
+
+    def __init__(self, fail_commit=False):
+        self.fail_commit = fail_commit
+        self.commits = 0
+        self.rollbacks = 0
+
+    def commit(self):
+        if self.fail_commit:
+            raise Exception("commit failed")
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+def write_rows(session, rows):
+    return rows
+
+def test_pending_rows_commit_on_interval_without_next_write():
+    session = FakeSession()
+    committed = []
+
+    async def run():
+        committer = ChunkedCommitter(session, committed.extend, rows=100, interval=0.05)
+        await committer.write(write_rows, [(1, 101), (2, 102)])
+        # 다음 묶음이 오지 않아도 interval이 지나면 커밋된다
+        await asyncio.sleep(0.2)
+        assert committed == [(1, 101), (2, 102)]
+        await committer.write(write_rows, [(3, 103)])
+        await committer.flush()
+        return committer
+
+    committer = asyncio.run(run())
+    assert committed == [(1, 101), (2, 102), (3, 103)]
+    assert (session.commits, committer.committed, committer.timer) == (2, 3, None)
+
+def test_failed_timer_commit_fails_later_writes():
+    session = FakeSession(fail_commit=True)
+    committed = []
+
+    async def run():
+        committer = ChunkedCommitter(session, committed.extend, rows=100, interval=0.05)
+        await committer.write(write_rows, [(1, 101)])
+        await asyncio.sleep(0.2)
+        with pytest.raises(Exception, match="commit failed"):
+            await committer.write(write_rows, [(2, 102)])
+        with pytest.raises(Exception, match="commit failed"):
+            await committer.flush()
+
+    asyncio.run(run())
+    assert committed == []
+    assert session.rollbacks == 1
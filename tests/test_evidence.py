@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.common.service.evidence import EvidenceTransfer, FileIdCache, UploadUrlBatcher
+
+def test_failed_batch_only_fails_the_caller_with_the_bad_file():
+    requests = []
+
+    async def request_upload_urls(file_metadatas):
+        requests.append([file_metadata["name"] for file_metadata in file_metadatas])
+        if any(file_metadata["name"] == "bad.png" for file_metadata in file_metadatas):
+            raise Exception("Failed to get upload URLs")
+        return [{"name": file_metadata["name"], "fileId": f"id-{file_metadata['name']}"} for file_metadata in file_metadatas]
+
+    async def run():
+        batcher = UploadUrlBatcher(request_upload_urls, max_count=100, max_bytes=1 << 30, linger=0.01)
+        callers = [
+            [{"name": f"club{index}-{file}.png", "size": 1} for file in range(2)]
+            for index in range(5)
+        ]
+        callers[3].append({"name": "bad.png", "size": 1})
+        return await asyncio.gather(*(batcher.request(files) for files in callers), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    # 처음 한 번에 모두 요청하고, 실패하면 호출자 단위로 나눠 다시 요청한다
+    assert len(requests[0]) == 11
+    assert isinstance(results[3], Exception)
+    for index, result in enumerate(results):
+        if index != 3:
+            assert [url_info["fileId"] for url_info in result] == [f"id-club{index}-{file}.png" for file in range(2)]
+
+@pytest.mark.parametrize("caller_count", [1, 2])
+def test_failed_batch_fails_every_file_of_a_single_bad_caller(caller_count):
+    async def request_upload_urls(file_metadatas):
+        raise Exception("Failed to get upload URLs")
+
+    async def run():
+        batcher = UploadUrlBatcher(request_upload_urls, max_count=100, max_bytes=1 << 30, linger=0.01)
+        return await asyncio.gather(
+            *(batcher.request([{"name": f"{index}.png", "size": 1}]) for index in range(caller_count)),
+            return_exceptions=True
+        )
+
+    assert all(isinstance(result, Exception) for result in asyncio.run(run()))
+
+def test_failed_upload_waits_for_sibling_uploads_before_cleanup(tmp_path):
+    transfer = EvidenceTransfer(streaming=False, cache=FileIdCache(str(tmp_path / "evidence_cache.sqlite3")))
+    finished = []
+
+    async def download(url, path):
+        with open(path, "wb") as f:
+            f.write(url.encode())
+        return len(url), f"hash-{url}"
+
+    async def request_upload_urls(file_metadatas):
+        return [{"name": file_metadata["name"], "fileId": f"id-{file_metadata['name']}", "uploadUrl": ""} for file_metadata in file_metadatas]
+
+    async def upload(url_info, path):
+        if url_info["name"] == "bad.png":
+            raise Exception("Failed to upload file: bad.png")
+        # 실패한 업로드와 같은 묶음의 다른 업로드는 임시 파일을 끝까지 읽는다
+        await asyncio.sleep(0.05)
+        with open(path, "rb") as f:
+            finished.append(f.read())
+
+    transfer.download = download
+    transfer.upload = upload
+    transfer.upload_url_batcher.request_upload_urls = request_upload_urls
+
+    async def run():
+        with pytest.raises(Exception, match="bad.png"):
+            await transfer.transfer([{"url": "http://files/good", "name": "good.png"}, {"url": "http://files/bad", "name": "bad.png"}])
+        assert transfer.in_flight == {}
+
+    asyncio.run(run())
+    assert finished == [b"http://files/good"]
+    assert transfer.cache.get_by_url("http://files/good") == "id-good.png"
+    transfer.cache.close()
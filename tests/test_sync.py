@@ -0,0 +1,37 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.activity.model.source import Activity as SourceActivity
+from app.benchmark.synthetic import Scale, SOURCE_METADATAS, recreate_schema, seed_source
+from app.common.service.checkpoint import CheckpointStore
+from app.common.service.sync import plan_sync
+
+SCALE = Scale(clubs=3, activities_per_club=4, fundings_per_club=1, evidences_per_activity=0, evidences_per_funding=0, students=10, executives=2)
+
+def plan(tmp_path, write_mode, completed_club_ids):
+    engine = create_engine(f"sqlite:///{tmp_path / 'source.db'}")
+    recreate_schema(engine, SOURCE_METADATAS)
+    seed_source(engine, SCALE, "http://127.0.0.1")
+    checkpoint = CheckpointStore(str(tmp_path / "checkpoint.sqlite3"))
+    for club_id in completed_club_ids:
+        checkpoint.mark_club_completed("activity", club_id)
+    session = sessionmaker(bind=engine)()
+    try:
+        return asyncio.run(plan_sync(session, checkpoint, "activity", SourceActivity, False, write_mode))
+    finally:
+        session.close()
+        checkpoint.close()
+        engine.dispose()
+
+def test_resumed_upsert_plan_counts_only_pending_clubs(tmp_path):
+    sync_plan = plan(tmp_path, "upsert", [1])
+
+    assert sorted(sync_plan.club_deltas) == [2, 3]
+    assert sync_plan.total == 2 * SCALE.activities_per_club
+
+def test_upsert_plan_without_pending_clubs_is_empty(tmp_path):
+    sync_plan = plan(tmp_path, "upsert", range(1, SCALE.clubs + 1))
+
+    assert (sync_plan.club_deltas, sync_plan.total) == ({}, 0)
@@ -0,0 +1,174 @@
+import datetime
+import itertools
+
+import pytest
+
+from app.activity.model.record import ActivityRecord, ActivityMemberRecord, ActivityFeedbackRecord
+from app.activity.service.transformation import transform_activity_rows, transform_activity_feedbacks
+from app.common.service.identity import IdentityIndex
+from app.funding.model.record import FundingRecord, FundingFixtureRecord, FundingTransportationMemberRecord, FundingFeedbackRecord
+from app.funding.service.transformation import transform_funding_rows
+from baseline_transformation import (
+    transform_activity,
+    transform_activity_t,
+    transform_activity_participants,
+    transform_activity_feedbacks as baseline_activity_feedbacks,
+    transform_funding,
+    transform_funding_transportation_passengers,
+    transform_funding_feedbacks,
+)
+
+BEFORE_CUTOFF = datetime.datetime(2024, 1, 10)
+AFTER_CUTOFF = datetime.datetime(2024, 5, 10)
+SIGN_14 = datetime.datetime(2024, 2, 1)
+SIGN_15 = datetime.datetime(2024, 7, 1)
+
+@pytest.fixture
+def identity_index():
+    index = IdentityIndex()
+    # 학번 -> student.id, 학번 -> executive.id (20200003은 executive가 아님)
+    index.student_ids = {20200001: 1, 20200002: 2, 20200003: 3}
+    index.executive_ids = {20200001: 11, 20200002: 12}
+    index.loaded = True
+    return index
+
+def make_activity(id, recent_edit, activity_type_id=1, proof_text="proof", recent_feedback=None, feedback_type=1):
+    return ActivityRecord(
+        id=id, club_id=1, title=f"activity {id}", activity_type_id=activity_type_id,
+        start_date=datetime.date(2024, 3, 1), end_date=datetime.date(2024, 3, 2),
+        location="L", purpose="P", content="C", proof_text=proof_text, feedback_type=feedback_type,
+        recent_edit=recent_edit, recent_feedback=recent_feedback,
+    )
+
+def make_funding(id, recent_edit, funding_feedback_type=2, approved_amount=1000, additional_explanation="E"):
+    return FundingRecord(
+        id=id, name=f"funding {id}", club_id=1, expenditure_date=datetime.date(2024, 3, 1),
+        expenditure_amount=2000, approved_amount=approved_amount, purpose=None,
+        is_transportation=True, is_non_corporate_transaction=False, is_food_expense=False, is_labor_contract=False,
+        is_external_event_participation_fee=False, is_publication=False, is_profit_making_activity=False,
+        is_joint_expense=False, additional_explanation=additional_explanation, funding_feedback_type=funding_feedback_type,
+        recent_edit=recent_edit, recent_feedback=None,
+    )
+
+def per_row_activities(identity_index, source_activities, activity_sign, members, feedbacks):
+    """activity마다 배치 이전의 row 단위 변환 함수를 호출한 결과 (하위 row의 activity_id는 묶음 안에서의 위치)"""
+    result = {"activities": [], "activity_ts": [], "participants": [], "feedbacks": []}
+    for position, source_activity in enumerate(source_activities):
+        result["activities"].append(transform_activity(source_activity, activity_sign))
+        result["activity_ts"].append(transform_activity_t(source_activity, position))
+        result["participants"] += transform_activity_participants(source_activity, members.get(source_activity.id, []), identity_index, position)
+        result["feedbacks"] += baseline_activity_feedbacks(feedbacks.get(source_activity.id, []), identity_index, position)
+    return result
+
+def per_row_fundings(identity_index, source_fundings, target_activity_ids, fixtures, members, feedbacks):
+    """funding마다 배치 이전의 row 단위 변환 함수를 호출한 결과 (하위 row의 funding_id는 묶음 안에서의 위치)"""
+    result = {"fundings": [], "passengers": [], "feedbacks": []}
+    for position, source_funding in enumerate(source_fundings):
+        result["fundings"].append(transform_funding(source_funding, target_activity_ids.get(source_funding.id), fixtures.get(source_funding.id)))
+        result["passengers"] += transform_funding_transportation_passengers(source_funding, members.get(source_funding.id, []), identity_index, position)
+        result["feedbacks"] += transform_funding_feedbacks(source_funding, feedbacks.get(source_funding.id, []), identity_index, position)
+    return result
+
+def test_activity_batch_matches_per_row(identity_index):
+    source_activities = [
+        make_activity(1, BEFORE_CUTOFF, activity_type_id=1),
+        make_activity(2, AFTER_CUTOFF, activity_type_id=2, recent_feedback=datetime.datetime(2024, 6, 1)),
+        make_activity(3, AFTER_CUTOFF, activity_type_id=9, proof_text=None, feedback_type=None),
+    ]
+    activity_sign = {14: SIGN_14, 15: SIGN_15}
+    members = {
+        1: [ActivityMemberRecord(1, 20200001), ActivityMemberRecord(1, 20209999)],
+        3: [ActivityMemberRecord(3, 20200002), ActivityMemberRecord(3, 20200003)],
+    }
+    feedbacks = {
+        1: [ActivityFeedbackRecord(1, 1, 20200001, BEFORE_CUTOFF, "good")],
+        2: [
+            ActivityFeedbackRecord(2, 2, 20200002, AFTER_CUTOFF, ""),
+            ActivityFeedbackRecord(3, 2, 20200001, AFTER_CUTOFF, "ok"),
+        ],
+    }
+
+    batch = transform_activity_rows(identity_index, source_activities, activity_sign, members, feedbacks)
+    assert batch == per_row_activities(identity_index, source_activities, activity_sign, members, feedbacks)
+
+    # activity_d 7은 14학기, 2는 15학기 서명 시각
+    assert [(row["activity_d_id"], row["professor_approved_at"]) for row in batch["activities"]] == [(7, SIGN_14), (2, SIGN_15), (2, SIGN_15)]
+    assert [row["activity_type_enum_id"] for row in batch["activities"]] == [3, 1, 2]
+    assert batch["activities"][2]["evidence"] == ""
+    # 타겟에 없는 학번은 빠지고, 빈 피드백은 건너뛴다
+    assert [(row["activity_id"], row["student_id"]) for row in batch["participants"]] == [(0, 1), (2, 2), (2, 3)]
+    assert [(row["activity_id"], row["executive_id"]) for row in batch["feedbacks"]] == [(0, 11), (1, 11)]
+
+def test_activity_feedbacks_per_row_matches_baseline(identity_index):
+    feedbacks = [
+        ActivityFeedbackRecord(1, 1, 20200001, BEFORE_CUTOFF, "good"),
+        ActivityFeedbackRecord(2, 1, 20200002, AFTER_CUTOFF, ""),
+        ActivityFeedbackRecord(3, 1, 20200002, AFTER_CUTOFF, "ok"),
+    ]
+    assert transform_activity_feedbacks(feedbacks, identity_index, 42) == baseline_activity_feedbacks(feedbacks, identity_index, 42)
+    assert [row["executive_id"] for row in transform_activity_feedbacks(feedbacks, identity_index, 42)] == [11, 12]
+
+def test_activity_batch_without_sign_matches_per_row(identity_index):
+    source_activities = [make_activity(1, BEFORE_CUTOFF), make_activity(2, AFTER_CUTOFF)]
+
+    batch = transform_activity_rows(identity_index, source_activities, {}, {}, {})
+    assert batch == per_row_activities(identity_index, source_activities, {}, {}, {})
+    assert [row["professor_approved_at"] for row in batch["activities"]] == [None, None]
+
+def test_activity_feedback_from_missing_executive_fails_in_both(identity_index):
+    source_activities = [make_activity(1, AFTER_CUTOFF)]
+    feedbacks = {1: [ActivityFeedbackRecord(1, 1, 20200003, AFTER_CUTOFF, "not an executive")]}
+
+    with pytest.raises(KeyError):
+        transform_activity_rows(identity_index, source_activities, {}, {}, feedbacks)
+    with pytest.raises(KeyError):
+        per_row_activities(identity_index, source_activities, {}, {}, feedbacks)
+
+def test_funding_batch_matches_per_row(identity_index):
+    # 비품 종류 1~4 x 소프트웨어 여부, 알 수 없는 종류, 비품 없음
+    fixture_cases = list(itertools.product([1, 2, 3, 4], [0, 1])) + [(5, 0)]
+    source_fundings = [
+        make_funding(id, BEFORE_CUTOFF if id % 2 else AFTER_CUTOFF, funding_feedback_type=(id % 5) or None)
+        for id in range(1, len(fixture_cases) + 2)
+    ]
+    # 승인 금액/설명이 없는 funding
+    source_fundings.append(make_funding(len(source_fundings) + 1, AFTER_CUTOFF, approved_amount=None, additional_explanation=None))
+    fixtures = {
+        funding_id: FundingFixtureRecord(
+            id=funding_id, funding_id=funding_id, funding_fixture_type_id=fixture_type_id,
+            fixture_name=f"fixture {funding_id}", fixture_type_id=funding_id % 5, usage_purpose="use",
+            is_software=is_software, software_proof_text="license",
+        )
+        for funding_id, (fixture_type_id, is_software) in enumerate(fixture_cases, start=1)
+    }
+    target_activity_ids = {1: 101, 4: 104}
+    members = {
+        1: [FundingTransportationMemberRecord(1, 20200001), FundingTransportationMemberRecord(1, 20209999)],
+        2: [FundingTransportationMemberRecord(2, 20200003)],
+    }
+    feedbacks = {
+        # 같은 added_time의 피드백은 마지막 것만 남고, executive가 아닌 학번은 건너뛴다
+        1: [
+            FundingFeedbackRecord(1, 1, 20200001, AFTER_CUTOFF, "first"),
+            FundingFeedbackRecord(2, 1, 20200002, AFTER_CUTOFF, "last"),
+            FundingFeedbackRecord(3, 1, 20200003, SIGN_15, "not an executive"),
+            FundingFeedbackRecord(4, 1, 20200001, SIGN_15, "later"),
+        ],
+        3: [FundingFeedbackRecord(5, 3, 20209999, AFTER_CUTOFF, "unknown")],
+    }
+
+    batch = transform_funding_rows(identity_index, source_fundings, target_activity_ids, fixtures, members, feedbacks)
+    assert batch == per_row_fundings(identity_index, source_fundings, target_activity_ids, fixtures, members, feedbacks)
+
+    by_id = {source_funding.id: row for source_funding, row in zip(source_fundings, batch["fundings"])}
+    assert (by_id[1]["activity_d_id"], by_id[2]["activity_d_id"]) == (7, 2)
+    assert (by_id[1]["purpose_activity_id"], by_id[2]["purpose_activity_id"]) == (101, None)
+    # 비품(1, 2)은 물품/비품 모두, 물품(3, 4)은 물품만, 소프트웨어 비품은 분류 4
+    assert (by_id[1]["is_fixture"], by_id[1]["fixture_class_enum"], by_id[1]["fixture_purpose"]) == (True, 1, "use")
+    assert (by_id[2]["is_fixture"], by_id[2]["fixture_class_enum"], by_id[2]["fixture_software_evidence"]) == (True, 4, "license")
+    assert (by_id[5]["is_fixture"], by_id[5]["club_supplies_evidence_enum"], by_id[5]["club_supplies_purpose"]) == (False, 1, "use")
+    assert (by_id[8]["is_fixture"], by_id[8]["club_supplies_evidence_enum"], by_id[8]["club_supplies_software_evidence"]) == (False, 2, "license")
+    assert "is_fixture" not in by_id[9] and "is_fixture" not in by_id[10]
+    assert (by_id[11]["approved_amount"], by_id[11]["trade_detail_explanation"]) == (0, "")
+    assert [(row["funding_id"], row["student_id"]) for row in batch["passengers"]] == [(0, 1), (1, 3)]
+    assert [(row["funding_id"], row["executive_id"], row["feedback"]) for row in batch["feedbacks"]] == [(0, 12, "last"), (0, 11, "later")]